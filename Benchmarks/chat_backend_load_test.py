@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from Utilities.fake_chat_model import ScriptedChatModel, tool_call_message
+from Utilities.graph_metrics import GraphMetrics, instrument_checkpointer
+from graph_overhead_benchmark import CHAT_REPLY, load_module, percentile, seed_hogwarts_cache
+from parallel_async_benchmark import ThreadSampler
+
+"""
+Headless load test of the chatbot backends the Streamlit frontends sit on.
+
+Each backend is loaded in its own subprocess (so memory growth is its own), its model swapped for the ScriptedChatModel,
+and `--users` simulated users send `--turns` messages at the same time, every user on its own thread_id. A backend is
+driven the way its frontend drives it:
+
+- blocking:        frontend_streamlit.py, `chatbot.invoke` (the first token is the whole answer)
+- streaming:       frontend_streamlit_with_streaming.py / frontend_streaming_with_threading.py, `chatbot.stream`
+- db / db_tools:   the DB frontends, `chatbot.stream` on the pooled SQLite checkpointer
+- db_async / db_tools_async: the async DB frontends, `stream_chat` on the shared event loop
+
+Reports time-to-first-token and full response latency percentiles, turns per second, checkpoint I/O time per turn,
+peak threads and the RSS growth of the process. `--output` writes all results as JSON for run to run comparisons.
+
+Usage:
+    python Benchmarks/chat_backend_load_test.py --users 1 10 50 --turns 5 --latency 0.3 --token-latency 0.01
+"""
+
+BACKENDS = {
+    'blocking': ('Streamlit_Chatbot/backend_langgraph.py', 'invoke', False),
+    'streaming': ('Streamlit_Chatbot/backend_langgraph.py', 'stream', False),
+    'db': ('Streamlit_Chatbot/Streamlit_DB_Integrated_Chatbot/db_integrated_backend.py', 'stream', False),
+    'db_async': ('Streamlit_Chatbot/Streamlit_DB_Integrated_Chatbot/db_integrated_async_backend.py', 'stream_chat', False),
+    'db_tools': ('Streamlit_Chatbot/Streamlit_DB_with_Tools_Chatbot/db_with_tools_integrated_backend.py', 'stream', True),
+    'db_tools_async': ('Streamlit_Chatbot/Streamlit_DB_with_Tools_Chatbot/db_with_tools_integrated_async_backend.py',
+                       'stream_chat', True),
+}
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        #Peak instead of current RSS where /proc is not available (ru_maxrss is in KiB on Linux, bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def tool_then_answer(messages):
+    #Every turn asks for one spell lookup and answers once the tool result is in
+    if isinstance(messages[-1], ToolMessage):
+        return CHAT_REPLY
+    return tool_call_message('get_that_spell_info', {'spell': 'lumos'})
+
+
+def load_backend(name: str, args):
+    path, _, tools = BACKENDS[name]
+    module = load_module(path, f"load_{name}")
+    model = ScriptedChatModel(responses=[CHAT_REPLY], latency=args.latency, token_latency=args.token_latency)
+    module.model = model
+    if tools:
+        module.model_with_tools = ScriptedChatModel(responses=[tool_then_answer], latency=args.latency,
+                                                    token_latency=args.token_latency)
+        seed_hogwarts_cache()
+    return module
+
+
+def make_turn(module, mode: str):
+    def stream_chunks(text: str, config: dict):
+        if mode == 'stream_chat':
+            return module.stream_chat(text, config)
+        return module.chatbot.stream({'messages': [HumanMessage(content=text)]}, config=config, stream_mode='messages')
+
+    def turn(text: str, config: dict) -> tuple[float, float]:
+        start = time.perf_counter()
+        if mode == 'invoke':
+            module.chatbot.invoke({'messages': [HumanMessage(content=text)]}, config=config)
+            seconds = time.perf_counter() - start
+            return seconds, seconds
+        first = None
+        for chunk, metadata in stream_chunks(text, config):
+            #Only answer tokens reach the user, like the AIMessage filter of the tools frontends
+            if first is None and isinstance(chunk, AIMessage) and chunk.content:
+                first = time.perf_counter() - start
+        seconds = time.perf_counter() - start
+        return (first if first is not None else seconds), seconds
+
+    return turn
+
+
+def run_worker(name: str, users: int, args) -> dict:
+    rss_before = rss_mb()
+    module = load_backend(name, args)
+    metrics = GraphMetrics(trace_path=None)
+    instrument_checkpointer(module.chatbot.checkpointer, name, metrics)
+    turn = make_turn(module, BACKENDS[name][1])
+
+    #One warm-up turn so imports and connection setup are not part of the first user's numbers
+    turn("Warm up.", {'configurable': {'thread_id': f"{name}-warmup"}})
+    metrics.histograms.clear()
+    rss_loaded = rss_mb()
+
+    ttfts, latencies, errors = [], [], []
+    lock = threading.Lock()
+    barrier = threading.Barrier(users)
+
+    def user(number: int):
+        config = {'configurable': {'thread_id': f"{name}-{users}-{number}"}}
+        barrier.wait()
+        for message in range(args.turns):
+            try:
+                ttft, seconds = turn(f"User {number}, message {message}: tell me something interesting.", config)
+            except Exception as error:
+                with lock:
+                    errors.append(f"{type(error).__name__}: {error}")
+                continue
+            with lock:
+                ttfts.append(ttft)
+                latencies.append(seconds)
+
+    threads = [threading.Thread(target=user, args=(number,)) for number in range(users)]
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+
+    turns = len(latencies)
+    checkpoint = {}
+    for (family, labels), histogram in metrics.histograms.items():
+        operation = labels[1]
+        checkpoint[operation] = {'calls': histogram.count, 'seconds': round(histogram.sum, 4),
+                                 'ms_per_turn': histogram.sum / max(1, turns) * 1000}
+
+    return {
+        'backend': name,
+        'users': users,
+        'turns': turns,
+        'errors': len(errors),
+        'turns_per_second': turns / seconds if seconds else 0.0,
+        'ttft_p50_ms': percentile(ttfts, 50) * 1000,
+        'ttft_p95_ms': percentile(ttfts, 95) * 1000,
+        'ttft_p99_ms': percentile(ttfts, 99) * 1000,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'checkpoint_ms_per_turn': sum(stats['ms_per_turn'] for stats in checkpoint.values()),
+        'checkpoint': checkpoint,
+        'peak_threads': sampler.peak,
+        'rss_import_mb': rss_loaded - rss_before,
+        'rss_growth_mb': rss_mb() - rss_loaded,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent simulated users against the chatbot backends.")
+    parser.add_argument('--backends', nargs='*', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--users', type=int, nargs='*', default=[1, 10, 50])
+    parser.add_argument('--turns', type=int, default=5, help="messages sent by every user")
+    parser.add_argument('--latency', type=float, default=0.3, help="scripted time to first token in seconds")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="scripted delay between tokens in seconds")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.users[0], args)))
+        return
+
+    env = {**os.environ, 'LLM_CACHE': 'off', 'SEARCH_CACHE': 'off', 'GRAPH_METRICS': 'off',
+           'CHECKPOINT_COMPACTION_INTERVAL': '0'}
+    results = []
+    for name in args.backends:
+        for users in args.users:
+            #A fresh process and database per run keeps the memory and database growth separate
+            with tempfile.TemporaryDirectory() as workdir:
+                env['CHATBOT_DB_PATH'] = str(Path(workdir) / 'chatbot.db')
+                completed = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), '--worker', name, '--users', str(users),
+                     '--turns', str(args.turns), '--latency', str(args.latency), '--token-latency', str(args.token_latency)],
+                    cwd=workdir, env=env, capture_output=True, text=True,
+                )
+            if completed.returncode != 0:
+                print(f"{name:<14} {users:>3} users | failed:\n{completed.stderr[-2000:]}")
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{name:<14} {users:>3} users | {result['turns_per_second']:6.1f} turns/s "
+                  f"| ttft p50 {result['ttft_p50_ms']:7.1f} p95 {result['ttft_p95_ms']:7.1f} ms "
+                  f"| latency p50 {result['latency_p50_ms']:7.1f} p95 {result['latency_p95_ms']:7.1f} ms "
+                  f"| checkpoint {result['checkpoint_ms_per_turn']:6.2f} ms/turn "
+                  f"| {result['peak_threads']:>3} threads | rss +{result['rss_growth_mb']:.1f} MiB"
+                  + (f" | {result['errors']} errors" if result['errors'] else ""))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
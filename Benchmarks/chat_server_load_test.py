@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from Utilities.fake_chat_model import ScriptedChatModel
+from graph_overhead_benchmark import CHAT_REPLY, percentile, seed_hogwarts_cache
+from chat_backend_load_test import tool_then_answer
+
+"""
+Load test of Chat_Server/chat_server.py over HTTP.
+
+The server runs in its own process (and on a temporary chatbot.db, so it starts empty) with the backend's
+model swapped for the ScriptedChatModel. `--users` simulated clients each post `--turns` messages to their own thread
+at the same time and read the replies as Server-Sent Events. Reports client side time-to-first-token and response
+latency percentiles, turns per second, messages rejected with 503 by the backpressure limits, the latency of a history
+page afterwards and the thread count and RSS of the server process.
+
+Usage:
+    python Benchmarks/chat_server_load_test.py --backends db db_tools --users 1 10 100 --turns 3 --max-concurrency 32
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_status(pid: int) -> dict:
+    #Threads and VmRSS of the server process, empty where /proc is not available
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status)
+    except OSError:
+        return {}
+    return {'threads': int(fields['Threads']), 'rss_mb': int(fields['VmRSS'].split()[0]) / 1024}
+
+
+def serve(args) -> None:
+    import uvicorn
+    sys.path.append(str(REPO_ROOT / "Chat_Server"))
+    import chat_server
+
+    #The app imports the same module when it starts, so the scripted models are already in place
+    module = chat_server.import_backend(args.serve)
+    module.model = ScriptedChatModel(responses=[CHAT_REPLY], latency=args.latency, token_latency=args.token_latency)
+    if hasattr(module, 'model_with_tools'):
+        module.model_with_tools = ScriptedChatModel(responses=[tool_then_answer], latency=args.latency,
+                                                    token_latency=args.token_latency)
+        seed_hogwarts_cache()
+
+    app = chat_server.create_app(args.serve, args.max_concurrency, args.max_queue, args.queue_timeout)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+async def send_message(client: httpx.AsyncClient, thread_id: str, content: str) -> dict:
+    start = time.perf_counter()
+    first = None
+    async with client.stream('POST', f"/threads/{thread_id}/messages", json={'content': content}) as response:
+        if response.status_code != 200:
+            await response.aread()
+            return {'status': response.status_code}
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: ") and event == 'token' and first is None:
+                first = time.perf_counter() - start
+            elif line.startswith("data: ") and event == 'error':
+                return {'status': 'error', 'error': json.loads(line[len("data: "):])}
+    seconds = time.perf_counter() - start
+    return {'status': 200, 'ttft': first if first is not None else seconds, 'latency': seconds}
+
+
+async def run_load(base_url: str, users: int, turns: int) -> dict:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        results = []
+
+        async def user(number: int):
+            for message in range(turns):
+                results.append(await send_message(client, f"user-{users}-{number}",
+                                                  f"User {number}, message {message}: tell me something interesting."))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(user(number) for number in range(users)))
+        seconds = time.perf_counter() - start
+
+        history = []
+        for number in range(min(users, 20)):
+            history_start = time.perf_counter()
+            (await client.get(f"/threads/user-{users}-{number}/messages", params={'limit': 30})).raise_for_status()
+            history.append(time.perf_counter() - history_start)
+        health = (await client.get("/health")).json()
+
+    ok = [result for result in results if result['status'] == 200]
+    ttfts = [result['ttft'] for result in ok]
+    latencies = [result['latency'] for result in ok]
+    return {
+        'users': users,
+        'turns': len(ok),
+        'rejected': sum(1 for result in results if result['status'] == 503),
+        'failed': sum(1 for result in results if result['status'] not in (200, 503)),
+        'turns_per_second': len(ok) / seconds if seconds else 0.0,
+        'ttft_p50_ms': percentile(ttfts, 50) * 1000,
+        'ttft_p95_ms': percentile(ttfts, 95) * 1000,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'history_p50_ms': percentile(history, 50) * 1000,
+        'server_rejected_total': health['rejected'],
+    }
+
+
+def wait_until_up(base_url: str, server: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited:\n{server.stderr.read()[-2000:]}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent SSE clients against the chat server.")
+    parser.add_argument('--backends', nargs='*', default=['basic', 'db', 'db_tools'], choices=['basic', 'db', 'db_tools'])
+    parser.add_argument('--users', type=int, nargs='*', default=[1, 10, 100])
+    parser.add_argument('--turns', type=int, default=3, help="messages sent by every user")
+    parser.add_argument('--latency', type=float, default=0.3, help="scripted time to first token in seconds")
+    parser.add_argument('--token-latency', type=float, default=0.01, help="scripted delay between tokens in seconds")
+    parser.add_argument('--max-concurrency', type=int, default=32)
+    parser.add_argument('--max-queue', type=int, default=128)
+    parser.add_argument('--queue-timeout', type=float, default=30)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    env = {**os.environ, 'LLM_CACHE': 'off', 'SEARCH_CACHE': 'off', 'GRAPH_METRICS': 'off',
+           'CHECKPOINT_COMPACTION_INTERVAL': '0'}
+    results = []
+    for name in args.backends:
+        #One server per backend, like a deployment, each user count uses its own threads
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        with tempfile.TemporaryDirectory() as workdir:
+            env['CHATBOT_DB_PATH'] = str(Path(workdir) / 'chatbot.db')
+            server = subprocess.Popen(
+                [sys.executable, str(Path(__file__).resolve()), '--serve', name, '--port', str(port),
+                 '--latency', str(args.latency), '--token-latency', str(args.token_latency),
+                 '--max-concurrency', str(args.max_concurrency), '--max-queue', str(args.max_queue),
+                 '--queue-timeout', str(args.queue_timeout)],
+                cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+            )
+            try:
+                wait_until_up(base_url, server)
+                #Warm-up so imports and the first checkpoint write are not part of the first run
+                asyncio.run(run_load(base_url, 1, 1))
+                for users in args.users:
+                    result = {'backend': name, **asyncio.run(run_load(base_url, users, args.turns)),
+                              **{f"server_{key}": value for key, value in process_status(server.pid).items()}}
+                    results.append(result)
+                    print(f"{name:<9} {users:>4} users | {result['turns_per_second']:6.1f} turns/s "
+                          f"| ttft p50 {result['ttft_p50_ms']:7.1f} p95 {result['ttft_p95_ms']:7.1f} ms "
+                          f"| latency p50 {result['latency_p50_ms']:7.1f} p95 {result['latency_p95_ms']:7.1f} ms "
+                          f"| history {result['history_p50_ms']:5.1f} ms | 503 {result['rejected']:>3} "
+                          f"| {result.get('server_threads', '-')} threads, {result.get('server_rss_mb', 0):.0f} MiB"
+                          + (f" | {result['failed']} failed" if result['failed'] else ""))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from Utilities.fake_chat_model import ScriptedChatModel
+from Utilities.pooled_sqlite_saver import PooledSqliteSaver
+from Utilities.thread_registry import RegisteredSqliteSaver
+from graph_overhead_benchmark import load_module, percentile, time_checkpointer
+
+"""
+Load test of the chatbot checkpointers with N concurrent chat sessions.
+
+The DB chatbot graph is compiled once per checkpointer, its model swapped for the ScriptedChatModel, and every session
+runs `--turns` turns on its own thread, reading its state with `get_state` after each turn like the frontend does.
+Compares the shared-connection RegisteredSqliteSaver used so far with PooledSqliteSaver (reader pool + group-committing
+writer thread) and reports p50/p99 latency of the checkpoint writes and state reads.
+
+Usage:
+    python Benchmarks/checkpointer_load_test.py --sessions 1 10 50 --turns 20
+"""
+
+CHECKPOINTERS = {
+    'shared': lambda path: RegisteredSqliteSaver(conn=sqlite3.connect(path, check_same_thread=False)),
+    'pooled': lambda path: PooledSqliteSaver(path),
+}
+
+
+def run_sessions(graph, make_checkpointer, sessions: int, turns: int, path: str) -> dict:
+    checkpointer = make_checkpointer(path)
+    timings = defaultdict(list)
+    time_checkpointer(checkpointer, timings)
+    chatbot = graph.compile(checkpointer=checkpointer)
+    errors = []
+
+    def session(number: int):
+        config = {'configurable': {'thread_id': f"load-{sessions}-{number}"}}
+        try:
+            for turn in range(turns):
+                chatbot.invoke({'messages': [('human', f"Turn {turn}: tell me something about databases.")]}, config=config)
+                start = time.perf_counter()
+                chatbot.get_state(config)
+                timings['get_state'].append(time.perf_counter() - start)
+        except Exception as error:
+            errors.append(f"{type(error).__name__}: {error}")
+
+    threads = [threading.Thread(target=session, args=(number,)) for number in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    result = {'sessions': sessions, 'turns_per_second': sessions * turns / seconds, 'errors': len(errors)}
+    for name in ('put', 'put_writes', 'get_state'):
+        result[f'{name}_p50_ms'] = percentile(timings[name], 50) * 1000
+        result[f'{name}_p99_ms'] = percentile(timings[name], 99) * 1000
+    if isinstance(checkpointer, PooledSqliteSaver):
+        result['writes_per_commit'] = checkpointer.batched_writes / max(1, checkpointer.batches)
+        checkpointer.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat sessions against the SQLite checkpointers.")
+    parser.add_argument('--sessions', type=int, nargs='*', default=[1, 10, 50])
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--checkpointers', nargs='*', default=list(CHECKPOINTERS), choices=list(CHECKPOINTERS))
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ['LLM_CACHE'] = 'off'
+    os.environ['CHECKPOINT_COMPACTION_INTERVAL'] = '0'
+    original_cwd = os.getcwd()
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            module = load_module('Streamlit_Chatbot/Streamlit_DB_Integrated_Chatbot/db_integrated_backend.py', 'load_db_backend')
+            module.model = ScriptedChatModel(responses=["Databases keep data safe across crashes."])
+            for name in args.checkpointers:
+                for sessions in args.sessions:
+                    result = {'checkpointer': name, **run_sessions(module.graph, CHECKPOINTERS[name], sessions, args.turns,
+                                                                   f"{name}-{sessions}.db")}
+                    results.append(result)
+                    print(f"{name:<7} {sessions:>3} sessions | {result['turns_per_second']:7.1f} turns/s "
+                          f"| put p50 {result['put_p50_ms']:6.2f} p99 {result['put_p99_ms']:7.2f} ms "
+                          f"| put_writes p50 {result['put_writes_p50_ms']:6.2f} p99 {result['put_writes_p99_ms']:7.2f} ms "
+                          f"| get_state p50 {result['get_state_p50_ms']:6.2f} p99 {result['get_state_p99_ms']:7.2f} ms"
+                          + (f" | {result['writes_per_commit']:.1f} writes/commit" if 'writes_per_commit' in result else "")
+                          + (f" | {result['errors']} errors" if result['errors'] else ""))
+        finally:
+            os.chdir(original_cwd)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from Utilities import hogwarts_api
+from Utilities.fake_chat_model import ScriptedChatModel, tool_call_message
+
+"""
+Offline benchmark for the graph code itself.
+
+Every workflow and chatbot backend is loaded from its file, its HuggingFace model(s) are swapped for the ScriptedChatModel
+and the compiled graph is driven N times. With the default zero model latency, everything that is measured is our own
+overhead: node bodies, prompt building, parsing, LangGraph scheduling and checkpoint writes.
+
+Usage:
+    python Benchmarks/graph_overhead_benchmark.py --iterations 200
+    python Benchmarks/graph_overhead_benchmark.py --scenarios parallel_workflow email_outreach --output results.json
+"""
+
+
+def load_module(relative_path: str, module_name: str):
+    """Imports a workflow script by path (the folders are not packages and the frontends import the backends by file name)."""
+    path = REPO_ROOT / relative_path
+    sys.path.insert(0, str(path.parent))
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Collects wall time per graph node and the part of it spent inside the chat model."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.node_starts = {}
+        self.llm_starts = {}
+        self.node_times = defaultdict(list)
+        self.llm_times = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get('langgraph_node')
+        #Only the node run itself, not the prompt/parser runnables nested inside it
+        if node and kwargs.get('name') == node:
+            self.node_starts[run_id] = (node, time.perf_counter())
+
+    def _end_node(self, run_id):
+        if started := self.node_starts.pop(run_id, None):
+            node, start = started
+            with self.lock:
+                self.node_times[node].append(time.perf_counter() - start)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_node(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end_node(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self.llm_starts[run_id] = ((metadata or {}).get('langgraph_node', '-'), time.perf_counter())
+
+    def _end_llm(self, run_id):
+        if started := self.llm_starts.pop(run_id, None):
+            node, start = started
+            with self.lock:
+                self.llm_times[node].append(time.perf_counter() - start)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end_llm(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        #A failed or aborted call still spent its time in the model, the node time includes it too
+        self._end_llm(run_id)
+
+
+def time_checkpointer(checkpointer, timings: dict) -> None:
+    """Wraps the write methods of a checkpointer instance to record how long each call takes."""
+    for method in ('put', 'put_writes'):
+        original = getattr(checkpointer, method)
+
+        def timed(*args, _original=original, _method=method, **kwargs):
+            start = time.perf_counter()
+            try:
+                return _original(*args, **kwargs)
+            finally:
+                timings[_method].append(time.perf_counter() - start)
+
+        setattr(checkpointer, method, timed)
+
+
+@dataclass
+class Scenario:
+    path: str
+    #Module attribute name -> scripted replies for the model stored under that name
+    models: dict[str, list]
+    make_input: Callable[[int], dict]
+    chat: bool = False
+    prepare: Callable[[], None] | None = None
+
+
+def seed_hogwarts_cache():
+    #The tools scenario calls the spell tool, keep it off the network (the backends import the same hogwarts_api module)
+    hogwarts_api.spells._build_index([{'name': 'Lumos', 'description': 'Creates light at the wand tip'}])
+    hogwarts_api.spells.loaded_at = time.time()
+
+
+def chat_input(i: int) -> dict:
+    return {'messages': [HumanMessage(content=f"Tell me something interesting, message number {i}.")]}
+
+
+CHAT_REPLY = "Here is an interesting fact: octopuses have three hearts and blue blood."
+
+SCENARIOS = {
+    'sequential_basic': Scenario(
+        'Sequential_Workflow_Examples/sequential_basic_workflow.py',
+        {'model': ["Gandhinagar is the capital of Gujarat."]},
+        lambda i: {'question': f"What is the capital of state number {i}?"},
+    ),
+    'prompt_chaining': Scenario(
+        'Sequential_Workflow_Examples/sequential_prompt_chaining.py',
+        {'model': ["1. What ML is 2. Why start now 3. What the series covers",
+                   "Kicking off a beginner ML series this week, follow along! #MachineLearning"]},
+        lambda i: {'topic': f"Starting a new ML Series, part {i}"},
+    ),
+    'parallel_workflow': Scenario(
+        'Parallel_Workflow_Examples/parallel_workflow_with_output_parser.py',
+        {'model': [{'fact': "He introduced hand washing in obstetric clinics.", 'rating': 8}]},
+        lambda i: {'person': f"Ignaz Semmelweis {i}"},
+    ),
+    'email_outreach': Scenario(
+        'Iterative_and_Conditional_Workflow_Examples/iterative_and_conditional_email_outreach.py',
+        {
+            'generator_model': ["Hi team, our AI database cuts query tuning to zero. Worth a 15 minute call this week?"],
+            'evaluator_model': [{'feedback': "Clear but generic opener.", 'evaluation': 're-iterate'},
+                                {'feedback': "Short and specific.", 'evaluation': 'approved'}],
+            'optimizer_model': ["Hi team, your DBAs spend hours tuning queries. Ours tunes itself. 15 minutes Thursday?"],
+        },
+        lambda i: {'campaign_details': f"Introduce an AI based database, campaign {i}", 'iteration': 1, 'max_iteration': 5},
+    ),
+    'memory_chatbot': Scenario(
+        'Streamlit_Chatbot/backend_langgraph.py',
+        {'model': [CHAT_REPLY]},
+        chat_input,
+        chat=True,
+    ),
+    'db_chatbot': Scenario(
+        'Streamlit_Chatbot/Streamlit_DB_Integrated_Chatbot/db_integrated_backend.py',
+        {'model': [CHAT_REPLY]},
+        chat_input,
+        chat=True,
+    ),
+    'db_tools_chatbot': Scenario(
+        'Streamlit_Chatbot/Streamlit_DB_with_Tools_Chatbot/db_with_tools_integrated_backend.py',
+        {'model': [CHAT_REPLY],
+         'model_with_tools': [tool_call_message('get_that_spell_info', {'spell': 'lumos'}), CHAT_REPLY]},
+        chat_input,
+        chat=True,
+        prepare=seed_hogwarts_cache,
+    ),
+}
+
+
+def run_scenario(name: str, scenario: Scenario, args) -> dict:
+    module = load_module(scenario.path, f"bench_{name}")
+    for attribute, responses in scenario.models.items():
+        setattr(module, attribute, ScriptedChatModel(responses=responses, latency=args.latency, token_latency=args.token_latency))
+    if scenario.prepare:
+        scenario.prepare()
+
+    checkpoint_timings = defaultdict(list)
+    graph = module.workflow if hasattr(module, 'workflow') else module.chatbot
+    if graph.checkpointer:
+        time_checkpointer(graph.checkpointer, checkpoint_timings)
+
+    timer = NodeTimer()
+    run_times = []
+
+    def run_once(i: int, callbacks: list):
+        config = {'callbacks': callbacks}
+        if scenario.chat:
+            #Spread the turns over a few threads so the conversations (and checkpoints) grow like real ones
+            config['configurable'] = {'thread_id': f"bench-{name}-{i % args.threads}"}
+        if args.stream and scenario.chat:
+            for _ in graph.stream(scenario.make_input(i), config=config, stream_mode='messages'):
+                pass
+        else:
+            graph.invoke(scenario.make_input(i), config=config)
+
+    for i in range(args.warmup):
+        run_once(-1 - i, [])
+    checkpoint_timings.clear()
+
+    total_start = time.perf_counter()
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        run_once(i, [timer])
+        run_times.append(time.perf_counter() - start)
+    total = time.perf_counter() - total_start
+
+    nodes = {}
+    for node, times in timer.node_times.items():
+        llm_time = sum(timer.llm_times.get(node, []))
+        nodes[node] = {
+            'calls': len(times),
+            'mean_ms': statistics.mean(times) * 1000,
+            'overhead_mean_ms': (sum(times) - llm_time) / len(times) * 1000,
+        }
+
+    checkpoints = {
+        method: {'calls': len(times), 'mean_ms': statistics.mean(times) * 1000, 'p99_ms': percentile(times, 99) * 1000}
+        for method, times in checkpoint_timings.items() if times
+    }
+
+    return {
+        'scenario': name,
+        'iterations': args.iterations,
+        'throughput_per_s': args.iterations / total if total else 0.0,
+        'latency_p50_ms': percentile(run_times, 50) * 1000,
+        'latency_p95_ms': percentile(run_times, 95) * 1000,
+        'nodes': nodes,
+        'checkpoint_writes': checkpoints,
+    }
+
+
+def print_report(results: list[dict]) -> None:
+    for result in results:
+        print(f"\n== {result['scenario']}: {result['throughput_per_s']:.1f} runs/s, "
+              f"p50 {result['latency_p50_ms']:.2f} ms, p95 {result['latency_p95_ms']:.2f} ms")
+        for node, stats in result['nodes'].items():
+            print(f"   node {node:<34} calls {stats['calls']:>6}  mean {stats['mean_ms']:8.3f} ms  "
+                  f"overhead {stats['overhead_mean_ms']:8.3f} ms")
+        for method, stats in result['checkpoint_writes'].items():
+            print(f"   checkpoint {method:<28} calls {stats['calls']:>6}  mean {stats['mean_ms']:8.3f} ms  "
+                  f"p99 {stats['p99_ms']:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline graph overhead benchmark with a scripted chat model.")
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=10, help="number of chat threads the turns are spread over")
+    parser.add_argument('--latency', type=float, default=0.0, help="scripted time to first token in seconds")
+    parser.add_argument('--token-latency', type=float, default=0.0, help="scripted delay between tokens in seconds")
+    parser.add_argument('--stream', action='store_true', help="drive the chatbots with stream_mode='messages'")
+    parser.add_argument('--llm-cache', action='store_true', help="keep the shared LLM response cache enabled")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    #Cache hits would skip the scripted model entirely and hide the per-node cost we are measuring
+    if not args.llm_cache:
+        os.environ['LLM_CACHE'] = 'off'
+
+    #Keep the DB backends away from the real chatbot.db
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['CHATBOT_DB_PATH'] = str(Path(workdir) / 'chatbot.db')
+        results = [run_scenario(name, SCENARIOS[name], args) for name in args.scenarios]
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from graph_overhead_benchmark import SCENARIOS, load_module, percentile
+from model_startup_benchmark import StubChatCompletions
+
+"""
+Latency and throughput of the sequential and parallel workflows on the model backends of Utilities.model_provider.
+
+Every (backend, workflow) pair runs in a fresh interpreter with MODEL_BACKEND set, so nothing in the workflow code is
+swapped: one warm-up run builds the client, then `--runs` runs one after another give the latency percentiles and the
+same number of runs through `workflow.batch(..., max_concurrency=--concurrency)` the throughput.
+
+- local:   MODEL_BACKEND=local against `--local-url`, e.g. llama.cpp's llama-server with a quantized model on the CPU.
+           Without `--local-url` a stub OpenAI-compatible server is started that streams its replies with
+           `--stub-latency` before the first token and `--stub-token-latency` between tokens.
+- remote:  MODEL_BACKEND=huggingface, the HF inference endpoints the workflows use by default (needs HF_TOKEN and
+           network access, left out of the default backends without HF_TOKEN).
+
+Usage:
+    python Benchmarks/model_backend_benchmark.py --runs 10 --concurrency 8
+    python Benchmarks/model_backend_benchmark.py --backends local remote --local-url http://127.0.0.1:8080
+"""
+
+WORKFLOWS = ['sequential_basic', 'prompt_chaining', 'parallel_workflow']
+
+
+class StreamingStubChatCompletions(StubChatCompletions):
+    """Chat completions stub that also streams (`"stream": true`) and answers prompts that ask for JSON with JSON."""
+
+    token_latency = 0.0
+
+    def reply(self, request: dict) -> str:
+        prompt = " ".join(str(message.get('content', '')) for message in request.get('messages', []))
+        if "JSON" in prompt:
+            return json.dumps({'fact': "He introduced hand washing in obstetric clinics.", 'rating': 8})
+        return "Here is an interesting fact: octopuses have three hearts and blue blood."
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        except (BrokenPipeError, ConnectionResetError):
+            #The structured nodes stop reading and close the connection as soon as their JSON object is complete
+            self.close_connection = True
+
+    def send_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        tokens = [token + " " for token in self.reply(request).split(" ")]
+        time.sleep(self.latency)
+        if not request.get('stream'):
+            time.sleep(self.token_latency * (len(tokens) - 1))
+            body = json.dumps({
+                'id': "stub", 'object': "chat.completion", 'created': int(time.time()), 'model': "stub",
+                'choices': [{'index': 0, 'message': {'role': "assistant", 'content': "".join(tokens).strip()},
+                             'finish_reason': "stop"}],
+                'usage': {'prompt_tokens': 3, 'completion_tokens': len(tokens), 'total_tokens': 3 + len(tokens)},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', "application/json")
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', "text/event-stream")
+        self.send_header('Transfer-Encoding', "chunked")
+        self.end_headers()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for number, token in enumerate(tokens):
+            if number:
+                time.sleep(self.token_latency)
+            last = number == len(tokens) - 1
+            chunk = {'id': completion_id, 'object': "chat.completion.chunk", 'created': int(time.time()), 'model': "stub",
+                     'choices': [{'index': 0, 'delta': {'role': "assistant", 'content': token.rstrip() if last else token},
+                                  'finish_reason': "stop" if last else None}]}
+            self.send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.send_chunk(b"")
+
+
+def run_worker(name: str, args) -> dict:
+    scenario = SCENARIOS[name]
+    module = load_module(scenario.path, f"backend_{name}")
+    workflow = module.workflow
+
+    #The first run builds the client and opens the connection
+    start = time.perf_counter()
+    workflow.invoke(scenario.make_input(0))
+    first_run = time.perf_counter() - start
+
+    latencies = []
+    for i in range(1, args.runs + 1):
+        start = time.perf_counter()
+        workflow.invoke(scenario.make_input(i))
+        latencies.append(time.perf_counter() - start)
+
+    inputs = [scenario.make_input(args.runs + 1 + i) for i in range(args.runs)]
+    start = time.perf_counter()
+    workflow.batch(inputs, config={'max_concurrency': args.concurrency})
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'workflow': name,
+        'first_run_ms': first_run * 1000,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'runs_per_second': len(inputs) / batch_seconds if batch_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workflow latency and throughput per model backend.")
+    default_backends = ['local', 'remote'] if os.getenv('HF_TOKEN') else ['local']
+    parser.add_argument('--backends', nargs='*', default=default_backends, choices=['local', 'remote'])
+    parser.add_argument('--workflows', nargs='*', default=WORKFLOWS, choices=WORKFLOWS)
+    parser.add_argument('--runs', type=int, default=10, help="sequential runs, and runs in the concurrent batch")
+    parser.add_argument('--concurrency', type=int, default=8, help="max_concurrency of the batch")
+    parser.add_argument('--local-url', help="OpenAI-compatible server for the local backend (default: a stub)")
+    parser.add_argument('--stub-latency', type=float, default=0.05, help="stub time to first token in seconds")
+    parser.add_argument('--stub-token-latency', type=float, default=0.01, help="stub delay between tokens in seconds")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args)))
+        return
+
+    server = None
+    local_url = args.local_url
+    if 'local' in args.backends and not local_url:
+        StreamingStubChatCompletions.latency = args.stub_latency
+        StreamingStubChatCompletions.token_latency = args.stub_token_latency
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StreamingStubChatCompletions)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        local_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    for backend in args.backends:
+        env = {**os.environ, 'LLM_CACHE': 'off', 'GRAPH_METRICS': 'off',
+               'MODEL_BACKEND': 'local' if backend == 'local' else 'huggingface'}
+        if backend == 'local':
+            env['LOCAL_MODEL_URL'] = local_url
+        for name in args.workflows:
+            with tempfile.TemporaryDirectory() as workdir:
+                completed = subprocess.run(
+                    [sys.executable, str(Path(__file__).resolve()), '--worker', name, '--runs', str(args.runs),
+                     '--concurrency', str(args.concurrency)],
+                    cwd=workdir, env=env, capture_output=True, text=True,
+                )
+            if completed.returncode != 0:
+                print(f"{backend:<7} {name:<18} | failed:\n{completed.stderr[-2000:]}")
+                continue
+            result = {'backend': backend, **json.loads(completed.stdout.strip().splitlines()[-1])}
+            results.append(result)
+            print(f"{backend:<7} {name:<18} | first run {result['first_run_ms']:8.1f} ms "
+                  f"| latency p50 {result['latency_p50_ms']:8.1f} p95 {result['latency_p95_ms']:8.1f} ms "
+                  f"| {result['runs_per_second']:6.2f} runs/s at concurrency {args.concurrency}")
+
+    if server:
+        server.shutdown()
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+"""
+Startup cost of the workflow modules: import time and the latency of the first and second model call.
+
+Every module is imported in a fresh interpreter, so nothing is shared between measurements. The model calls go
+through the local model backend to a small server speaking the chat completions API, which answers after `--latency`
+seconds; the first call therefore shows what building the client and opening the connection costs on top of that,
+the second call what is left once the client and its keep-alive connection exist.
+
+Usage:
+    python Benchmarks/model_startup_benchmark.py --repeats 5
+    python Benchmarks/model_startup_benchmark.py --no-calls      (import time only, works without the local backend)
+"""
+
+MODULES = {
+    'Sequential_Workflow_Examples/sequential_basic_workflow.py': 'model',
+    'Sequential_Workflow_Examples/sequential_prompt_chaining.py': 'model',
+    'Parallel_Workflow_Examples/parallel_workflow_with_output_parser.py': 'model',
+    'Iterative_and_Conditional_Workflow_Examples/iterative_and_conditional_email_outreach.py': 'generator_model',
+    'Chatbot/basic_chatbot.py': 'model',
+    'Streamlit_Chatbot/backend_langgraph.py': 'model',
+    'Streamlit_Chatbot/Streamlit_DB_Integrated_Chatbot/db_integrated_backend.py': 'model',
+    'Streamlit_Chatbot/Streamlit_DB_with_Tools_Chatbot/db_with_tools_integrated_backend.py': 'model',
+}
+
+PROBE = """
+import importlib.util, json, sys, time
+path, attribute, calls = sys.argv[1], sys.argv[2], sys.argv[3] == '1'
+start = time.perf_counter()
+sys.path.insert(0, str(__import__('pathlib').Path(path).parent))
+spec = importlib.util.spec_from_file_location('startup_probe', path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+result = {'import_seconds': time.perf_counter() - start}
+if calls:
+    model = getattr(module, attribute)
+    for name in ('first_call_seconds', 'second_call_seconds'):
+        start = time.perf_counter()
+        model.invoke("Say hi")
+        result[name] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+
+class StubChatCompletions(BaseHTTPRequestHandler):
+    """Answers every POST with a fixed chat completion after `latency` seconds."""
+
+    protocol_version = "HTTP/1.1"
+    #Headers and body are written separately, without this Nagle + delayed ACK add ~40 ms to every kept-alive request
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.latency)
+        body = json.dumps({
+            'id': "stub", 'object': "chat.completion", 'created': int(time.time()), 'model': "stub",
+            'choices': [{'index': 0, 'message': {'role': "assistant", 'content': "Hi!"}, 'finish_reason': "stop"}],
+            'usage': {'prompt_tokens': 3, 'completion_tokens': 2, 'total_tokens': 5},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', "application/json")
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def probe(path: str, attribute: str, calls: bool, env: dict, workdir: str) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE, str(REPO_ROOT / path), attribute, '1' if calls else '0'],
+        env=env, cwd=workdir, capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and first-call latency of the workflow modules.")
+    parser.add_argument('--modules', nargs='*', default=list(MODULES), choices=list(MODULES))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.05, help="stub endpoint latency per request in seconds")
+    parser.add_argument('--no-calls', action='store_true', help="only measure the import time")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    StubChatCompletions.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChatCompletions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    env = {
+        **os.environ,
+        'LLM_CACHE': 'off',
+        'MODEL_BACKEND': 'local',
+        'LOCAL_MODEL_URL': f"http://127.0.0.1:{server.server_port}",
+    }
+
+    results = []
+    #Keep the DB backends away from the real chatbot.db
+    with tempfile.TemporaryDirectory() as workdir:
+        env['CHATBOT_DB_PATH'] = str(Path(workdir) / 'chatbot.db')
+        for path in args.modules:
+            runs = [probe(path, MODULES[path], not args.no_calls, env, workdir) for _ in range(args.repeats)]
+            result = {'module': path, **{name: statistics.median(run[name] for run in runs) for name in runs[0]}}
+            results.append(result)
+            print(f"{path:<90} " + "  ".join(f"{name.removesuffix('_seconds')} {value * 1000:8.1f} ms"
+                                               for name, value in result.items() if name != 'module'))
+    server.shutdown()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
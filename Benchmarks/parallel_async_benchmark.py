@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from Utilities.fake_chat_model import ScriptedChatModel
+from graph_overhead_benchmark import load_module
+
+"""
+Sync vs async execution of the parallel fact-rating workflow for N people.
+
+The sync graph is driven with `workflow.batch` (one thread per in-flight person plus LangGraph's pool for the three
+parallel nodes), the async graph with `arun_people` on a single event loop. The scripted model sleeps for `--latency`
+seconds per call, which stands in for the endpoint round trip. Reports wall-clock time and the peak number of live threads.
+
+Usage:
+    python Benchmarks/parallel_async_benchmark.py --people 10 100 500 --latency 0.5
+"""
+
+
+class ThreadSampler:
+    """Samples threading.active_count() in the background and keeps the peak."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        #The sampler itself is not part of the measured workload
+        self.peak -= 1
+
+
+def measure(run) -> dict:
+    with ThreadSampler() as sampler:
+        start = time.perf_counter()
+        results = run()
+        seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'peak_threads': sampler.peak, 'runs': len(results)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async parallel workflow benchmark.")
+    parser.add_argument('--people', type=int, nargs='*', default=[10, 50, 200])
+    parser.add_argument('--latency', type=float, default=0.5, help="scripted model latency per call in seconds")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ['LLM_CACHE'] = 'off'
+    module = load_module('Parallel_Workflow_Examples/parallel_workflow_with_output_parser.py', 'bench_parallel_async')
+    module.model = ScriptedChatModel(responses=[{'fact': "He introduced hand washing in clinics.", 'rating': 8}],
+                                     latency=args.latency)
+
+    results = []
+    for count in args.people:
+        inputs = [{'person': f"Scientist {i}"} for i in range(count)]
+        people = [state['person'] for state in inputs]
+
+        sync = measure(lambda: module.workflow.batch(inputs, config={'max_concurrency': count}))
+        async_ = measure(lambda: asyncio.run(module.arun_people(people, concurrency=count)))
+
+        results.append({'people': count, 'sync': sync, 'async': async_})
+        print(f"{count:>5} people | sync {sync['seconds']:7.2f} s, {sync['peak_threads']:>4} threads "
+              f"| async {async_['seconds']:7.2f} s, {async_['peak_threads']:>4} threads")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
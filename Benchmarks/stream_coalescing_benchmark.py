@@ -0,0 +1,115 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from statistics import mean
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+
+"""
+UI updates of `st.write_stream` with and without Utilities.stream_coalescing.
+
+Every response is rendered by a real Streamlit script run (streamlit.testing's AppTest) that streams a ScriptedChatModel
+reply the same way the frontends do. Each ForwardMsg the script sends to its session is counted and serialized like the
+server does before writing it to the websocket. Reports messages and bytes per response, the process CPU time per
+response and the time until the first text reached the session.
+
+Usage:
+    python Benchmarks/stream_coalescing_benchmark.py --tokens 300 --token-ms 10 --responses 5
+"""
+
+
+def chat_script(repo_root: str, tokens: int, token_latency: float, coalesce: bool, max_delay: float, max_chars: int):
+    import sys
+    sys.path.append(repo_root)
+    import streamlit as st
+    from Utilities.fake_chat_model import ScriptedChatModel
+    from Utilities.stream_coalescing import coalesce_chunks
+
+    reply = " ".join(f"word{number}" for number in range(tokens))
+    model = ScriptedChatModel(responses=[reply], token_latency=token_latency)
+    chunks = (chunk.content for chunk in model.stream("Tell me something."))
+    if coalesce:
+        chunks = coalesce_chunks(chunks, max_delay=max_delay, max_chars=max_chars)
+    with st.chat_message('assistant'):
+        st.write_stream(chunks)
+
+
+class MessageCounter:
+    """Counts and serializes every ForwardMsg a script run enqueues for its session."""
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.first_text = None
+        self._original = ScriptRunContext.enqueue
+
+    def __enter__(self):
+        counter = self
+
+        def enqueue(context, msg):
+            counter.messages += 1
+            counter.bytes += len(msg.SerializeToString())
+            if counter.first_text is None and msg.delta.new_element.markdown.body:
+                counter.first_text = time.perf_counter()
+            return counter._original(context, msg)
+
+        ScriptRunContext.enqueue = enqueue
+        return self
+
+    def __exit__(self, *exc):
+        ScriptRunContext.enqueue = self._original
+
+
+def make_app(coalesce: bool, args) -> AppTest:
+    return AppTest.from_function(chat_script, default_timeout=600, kwargs={
+        'repo_root': str(REPO_ROOT), 'tokens': args.tokens, 'token_latency': args.token_ms / 1000,
+        'coalesce': coalesce, 'max_delay': args.flush_ms / 1000, 'max_chars': args.flush_chars,
+    })
+
+
+def run_mode(coalesce: bool, args) -> dict:
+    results = []
+    for _ in range(args.responses):
+        app = make_app(coalesce, args)
+        with MessageCounter() as counter:
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            app.run()
+            cpu = time.process_time() - start_cpu
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+        results.append({'messages': counter.messages, 'bytes': counter.bytes, 'cpu_ms': cpu * 1000,
+                        'first_text_ms': ((counter.first_text or start_wall) - start_wall) * 1000})
+    return {key: mean(result[key] for result in results) for key in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Websocket messages and CPU per streamed response, raw vs coalesced.")
+    parser.add_argument('--tokens', type=int, default=300)
+    parser.add_argument('--token-ms', type=float, default=10, help="delay between two streamed tokens")
+    parser.add_argument('--responses', type=int, default=5)
+    parser.add_argument('--flush-ms', type=float, default=50)
+    parser.add_argument('--flush-chars', type=int, default=64)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    #The first script run pays for the imports, keep it out of both modes
+    make_app(False, argparse.Namespace(**{**vars(args), 'tokens': 5})).run()
+
+    results = []
+    for name, coalesce in (('per-token', False), ('coalesced', True)):
+        result = {'mode': name, **run_mode(coalesce, args)}
+        results.append(result)
+        print(f"{name:<9} | {result['messages']:6.0f} msgs/response | {result['bytes'] / 1024:8.1f} KiB/response "
+              f"| cpu {result['cpu_ms']:7.1f} ms/response | first text after {result['first_text_ms']:6.1f} ms")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(REPO_ROOT))
+from Utilities.history_cache import ConversationHistory
+from Utilities.thread_registry import title_from_messages
+from Utilities.graph_metrics import instrument
+
+"""
+ASGI chat service on top of the chatbot graphs, without Streamlit.
+
+Streamlit reruns the whole script for every interaction and holds a thread per streaming session. This service loads
+one backend when it starts, compiles its graph once on the server's event loop (with its own AsyncSqliteSaver for the
+DB backends) and shares that graph and checkpointer across all requests:
+
+    GET  /health                        in-flight and queued generations
+    GET  /threads?limit=50              threads, most recently updated first
+    POST /threads                       a new thread_id
+    GET  /threads/{id}/messages         history page, `before` / `limit` as in Utilities.history_cache
+    POST /threads/{id}/messages         {"content": "..."}, the reply streamed as Server-Sent Events:
+                                        `token` {"content"}, `tool` {"name", "status"}, `done` {...} or `error`
+
+At most `max_concurrency` generations run at the same time, up to `max_queue` more wait for a slot for at most
+`queue_timeout` seconds, anything beyond that is answered with 503 and Retry-After right away. A thread takes one
+message at a time (409 while a reply on it is streaming). A slow SSE client slows down only its own generation, as
+every token waits for the transport to accept the previous one, and a client that disconnects cancels its generation.
+
+Usage:
+    python Chat_Server/chat_server.py --backend db --port 8000 --max-concurrency 32 --max-queue 128
+    curl -N -X POST localhost:8000/threads/demo/messages -H 'Content-Type: application/json' -d '{"content": "Hi"}'
+
+Settings can also come from CHAT_SERVER_BACKEND, CHAT_SERVER_MAX_CONCURRENCY, CHAT_SERVER_MAX_QUEUE and
+CHAT_SERVER_QUEUE_TIMEOUT. `--workers` starts several processes, which only share conversations through chatbot.db.
+"""
+
+BACKENDS = {
+    'basic': ('Streamlit_Chatbot', 'backend_langgraph'),
+    'db': ('Streamlit_Chatbot/Streamlit_DB_Integrated_Chatbot', 'db_integrated_async_backend'),
+    'db_tools': ('Streamlit_Chatbot/Streamlit_DB_with_Tools_Chatbot', 'db_with_tools_integrated_async_backend'),
+}
+
+BACKEND = os.getenv("CHAT_SERVER_BACKEND", "db")
+MAX_CONCURRENCY = int(os.getenv("CHAT_SERVER_MAX_CONCURRENCY", "32"))
+MAX_QUEUE = int(os.getenv("CHAT_SERVER_MAX_QUEUE", "128"))
+QUEUE_TIMEOUT = float(os.getenv("CHAT_SERVER_QUEUE_TIMEOUT", "30"))
+
+
+def import_backend(name: str):
+    folder, module = BACKENDS[name]
+    path = str(REPO_ROOT / folder)
+    if path not in sys.path:
+        sys.path.append(path)
+    return importlib.import_module(module)
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Lease:
+    """A generation slot plus the thread it streams to, released exactly once."""
+
+    def __init__(self, service: "ChatService", thread_id: str):
+        self.service = service
+        self.thread_id = thread_id
+        self.released = False
+
+    async def release(self) -> None:
+        if self.released:
+            return
+        self.released = True
+        self.service.busy_threads.discard(self.thread_id)
+        self.service.in_flight -= 1
+        self.service.slots.release()
+
+
+class ChatService:
+    def __init__(self, chatbot, checkpointer, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.chatbot = chatbot
+        self.checkpointer = checkpointer
+        #The DB backends keep a thread registry next to their checkpoints, the in-memory one has none
+        self.registry = getattr(checkpointer, 'registry', None)
+        self.history = ConversationHistory(self.load_messages, self.thread_version)
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.busy_threads: set[str] = set()
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    #History and thread version are read from a worker thread (ConversationHistory is sync), the checkpointers'
+    #sync methods hand the query over to the server loop themselves
+    def load_messages(self, thread_id) -> list:
+        return self.chatbot.get_state(config={'configurable': {'thread_id': thread_id}}).values.get('messages', [])
+
+    def thread_version(self, thread_id):
+        if self.registry is not None:
+            thread = self.registry.get_thread(thread_id)
+            return thread.updated_at if thread else None
+        checkpoint = self.checkpointer.get_tuple({'configurable': {'thread_id': thread_id}})
+        return checkpoint.config['configurable']['checkpoint_id'] if checkpoint else None
+
+    async def list_threads(self, limit: int) -> list[dict]:
+        if self.registry is not None:
+            return [asdict(thread) for thread in await asyncio.to_thread(self.registry.list_threads, limit=limit)]
+
+        #The newest checkpoint of each thread comes first
+        threads = {}
+        async for checkpoint in self.checkpointer.alist(None):
+            thread_id = checkpoint.config['configurable']['thread_id']
+            if thread_id not in threads:
+                messages = checkpoint.checkpoint['channel_values'].get('messages')
+                threads[thread_id] = {'thread_id': thread_id, 'title': title_from_messages(messages)}
+        return list(threads.values())[:limit]
+
+    async def admit(self, thread_id: str) -> Lease:
+        if thread_id in self.busy_threads:
+            raise HTTPException(409, f"Thread {thread_id} is already answering a message.")
+        if self.slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(503, "Too many messages in flight, retry shortly.", headers={'Retry-After': '1'})
+
+        self.busy_threads.add(thread_id)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.busy_threads.discard(thread_id)
+            self.rejected += 1
+            raise HTTPException(503, "No generation slot became free in time, retry shortly.", headers={'Retry-After': '1'})
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return Lease(self, thread_id)
+
+    async def stream_reply(self, lease: Lease, content: str, queued_seconds: float):
+        config = {'configurable': {'thread_id': lease.thread_id}}
+        start = time.perf_counter()
+        first_token = None
+        try:
+            async for chunk, metadata in self.chatbot.astream({'messages': [HumanMessage(content=content)]},
+                                                              config=config, stream_mode='messages'):
+                if isinstance(chunk, ToolMessage):
+                    yield sse('tool', {'name': chunk.name, 'status': chunk.status})
+                elif isinstance(chunk, AIMessage) and chunk.content:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                    yield sse('token', {'content': chunk.text})
+            yield sse('done', {'thread_id': lease.thread_id, 'queued_ms': round(queued_seconds * 1000, 1),
+                               'ttft_ms': round((first_token or 0.0) * 1000, 1),
+                               'latency_ms': round((time.perf_counter() - start) * 1000, 1)})
+        except Exception as error:
+            yield sse('error', {'error': type(error).__name__, 'message': str(error)})
+        finally:
+            await lease.release()
+
+
+def service(request: Request) -> ChatService:
+    return request.app.state.service
+
+
+async def health(request: Request):
+    chat = service(request)
+    return JSONResponse({'status': 'ok', 'in_flight': chat.in_flight, 'waiting': chat.waiting,
+                         'max_concurrency': chat.max_concurrency, 'max_queue': chat.max_queue, 'rejected': chat.rejected})
+
+
+async def list_threads(request: Request):
+    limit = int(request.query_params.get('limit', 50))
+    return JSONResponse({'threads': await service(request).list_threads(limit)})
+
+
+async def create_thread(request: Request):
+    return JSONResponse({'thread_id': uuid.uuid4().hex}, status_code=201)
+
+
+async def get_messages(request: Request):
+    params = request.query_params
+    before = int(params['before']) if params.get('before') else None
+    limit = int(params['limit']) if params.get('limit') else None
+    page = await asyncio.to_thread(service(request).history.page, request.path_params['thread_id'], before, limit)
+    return JSONResponse(asdict(page))
+
+
+async def post_message(request: Request):
+    try:
+        content = (await request.json()).get('content')
+    except (ValueError, AttributeError):
+        content = None
+    if not isinstance(content, str) or not content.strip():
+        raise HTTPException(422, 'Expected a JSON body like {"content": "..."}.')
+
+    chat = service(request)
+    queued = time.perf_counter()
+    lease = await chat.admit(request.path_params['thread_id'])
+    #The background task covers a client that is gone before the stream ever starts, release() only runs once
+    return StreamingResponse(chat.stream_reply(lease, content, time.perf_counter() - queued),
+                             media_type='text/event-stream', background=BackgroundTask(lease.release),
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def create_app(backend: str = BACKEND, max_concurrency: int = MAX_CONCURRENCY, max_queue: int = MAX_QUEUE,
+               queue_timeout: float = QUEUE_TIMEOUT) -> Starlette:
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        module = import_backend(backend)
+        if hasattr(module, 'open_checkpointer'):
+            #AsyncSqliteSaver binds to the loop it is created on, the server gets its own on the server loop
+            checkpointer = await module.open_checkpointer()
+            chatbot = instrument(module.graph.compile(checkpointer=checkpointer), f"chat_server_{backend}")
+        else:
+            checkpointer, chatbot = module.checkpointer, module.chatbot
+        app.state.service = ChatService(chatbot, checkpointer, max_concurrency, max_queue, queue_timeout)
+        try:
+            yield
+        finally:
+            if hasattr(checkpointer, 'conn') and hasattr(checkpointer.conn, 'close'):
+                await checkpointer.conn.close()
+
+    return Starlette(
+        routes=[
+            Route('/health', health),
+            Route('/threads', list_threads, methods=['GET']),
+            Route('/threads', create_thread, methods=['POST']),
+            Route('/threads/{thread_id}/messages', get_messages, methods=['GET']),
+            Route('/threads/{thread_id}/messages', post_message, methods=['POST']),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Chat service with SSE streaming on top of the chatbot graphs.")
+    parser.add_argument('--backend', default=BACKEND, choices=list(BACKENDS))
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="server processes, conversations are shared through chatbot.db")
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY, help="generations running at once per process")
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE, help="messages waiting for a generation slot per process")
+    parser.add_argument('--queue-timeout', type=float, default=QUEUE_TIMEOUT, help="seconds a message waits for a slot")
+    args = parser.parse_args()
+
+    if args.workers > 1 and args.backend == 'basic':
+        parser.error("the basic backend keeps its threads in memory, every worker process would have its own")
+
+    #Worker processes import the app again, they get the settings through the environment
+    os.environ.update({'CHAT_SERVER_BACKEND': args.backend, 'CHAT_SERVER_MAX_CONCURRENCY': str(args.max_concurrency),
+                       'CHAT_SERVER_MAX_QUEUE': str(args.max_queue), 'CHAT_SERVER_QUEUE_TIMEOUT': str(args.queue_timeout)})
+    uvicorn.run("chat_server:app", app_dir=str(Path(__file__).resolve().parent), host=args.host, port=args.port,
+                workers=args.workers)
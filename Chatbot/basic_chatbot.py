@@ -1,56 +1,212 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated
-from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
 from dotenv import load_dotenv
+import argparse
+import asyncio
+import signal
+import sys
+import threading
+import uuid
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from Utilities.context_window import ContextPolicy, aprepare_context, prepare_context
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.graph_metrics import instrument
+
+"""
+Basic chatbot with a streaming command line chat.
+
+The REPL streams the reply token by token with `astream(..., stream_mode='messages')`, so the answer starts to show
+after the time to first token instead of after the whole generation. Ctrl-C while a reply is streaming cancels only
+that generation (what was already shown is kept in the thread), Ctrl-C or Ctrl-D at the prompt ends the session.
+
+Conversations are kept in memory unless `--db` names an SQLite file, which keeps them across sessions.
+
+Commands:
+    /new            start a new thread
+    /thread <id>    switch to (or create) thread <id>
+    /threads        list the threads of the checkpointer
+    /clear          delete the current thread
+    /exit           quit (as do `exit` and `bye`)
+"""
 
 load_dotenv()
+enable_llm_cache()
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
+model = get_chat_model()
 
-model = ChatHuggingFace(llm=llm)
+
+context_policy = ContextPolicy(max_messages=20)
 
 
 #Define the state
 class ChatbotState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    #Rolling summary of the messages that dropped out of the context window
+    summary: str
+    summarized_count: int
 
 
 #Define the nodes
 def llm_convo(state: ChatbotState):
-    messages = state["messages"]
+    messages, summary_update = prepare_context(model, state, context_policy)
 
     response = model.invoke(messages)
 
-    return {'messages': [response]}
+    return {'messages': [response], **summary_update}
+
+
+async def allm_convo(state: ChatbotState):
+    messages, summary_update = await aprepare_context(model, state, context_policy)
+
+    response = await model.ainvoke(messages)
+
+    return {'messages': [response], **summary_update}
 
 
 #Define the graph
 graph = StateGraph(ChatbotState)
 checkpointer = MemorySaver()
 
-graph.add_node('llm_chat', llm_convo)
+#invoke keeps the sync node, the REPL's astream runs the async one so Ctrl-C can cancel the model request itself
+graph.add_node('llm_chat', RunnableLambda(llm_convo, afunc=allm_convo))
 
 graph.add_edge(START, 'llm_chat')
 graph.add_edge('llm_chat', END)
 
-chatbot = graph.compile(checkpointer= checkpointer)
-
-
-
-thread_id = 1
-
-while True:
-    user_input = input("User: ")
-    if user_input.strip().lower() in ['exit', 'bye']:
-        break
-
-    config = {'configurable': {'thread_id': thread_id}}
-    response = chatbot.invoke({'messages': [HumanMessage(content= user_input)]}, 
-                              config= config)
-    print("AI: ", response['messages'][-1].content)
\ No newline at end of file
+chatbot = instrument(graph.compile(checkpointer= checkpointer), 'basic_chatbot')
+
+
+HELP = "Commands: /new, /thread <id>, /threads, /clear, /exit. Ctrl-C stops a reply while it streams."
+
+
+def start_reader(loop: asyncio.AbstractEventLoop, lines: asyncio.Queue) -> None:
+    #A daemon thread blocked in readline never holds up the exit, unlike a worker of the loop's default executor
+    def read():
+        while True:
+            line = sys.stdin.readline()
+            loop.call_soon_threadsafe(lines.put_nowait, line.rstrip("\n") if line else None)
+            if not line:
+                return
+
+    threading.Thread(target=read, name="repl-input", daemon=True).start()
+
+
+async def stream_reply(app, user_input: str, config: dict, shown: list[str]) -> None:
+    async for chunk, metadata in app.astream({'messages': [HumanMessage(content= user_input)]},
+                                             config= config, stream_mode='messages'):
+        #A reply from the LLM cache arrives as one whole AIMessage instead of chunks
+        if isinstance(chunk, AIMessage) and chunk.content:
+            shown.append(chunk.text)
+            print(chunk.text, end="", flush=True)
+
+
+async def keep_partial_reply(app, config: dict, shown: list[str]) -> None:
+    #The user message is already checkpointed, the part of the reply that was shown follows it so the thread stays readable
+    if shown:
+        await app.aupdate_state(config, {'messages': [AIMessage(content="".join(shown),
+                                                                response_metadata={'cancelled': True})]},
+                                as_node='llm_chat')
+
+
+async def list_threads(saver) -> list[str]:
+    threads = []
+    async for checkpoint in saver.alist(None):
+        thread_id = checkpoint.config['configurable']['thread_id']
+        if thread_id not in threads:
+            threads.append(thread_id)
+    return threads
+
+
+async def repl(app, saver, thread_id: str) -> None:
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+    start_reader(loop, lines)
+
+    current: asyncio.Task | None = None
+
+    def on_interrupt(signum, frame):
+        #Signal handlers run on the main thread between bytecodes, the cancel itself has to happen on the loop
+        if current is not None:
+            loop.call_soon_threadsafe(current.cancel)
+
+    previous_handler = signal.signal(signal.SIGINT, on_interrupt)
+    print(f"Thread {thread_id}. {HELP}")
+    try:
+        while True:
+            print("User: ", end="", flush=True)
+            current = asyncio.ensure_future(lines.get())
+            try:
+                user_input = await current
+            except asyncio.CancelledError:
+                user_input = None
+            if user_input is None:
+                print()
+                break
+
+            command, _, argument = user_input.strip().partition(" ")
+            if command.lower() in ['exit', 'bye', '/exit']:
+                break
+            if not command:
+                continue
+            if command == '/help':
+                print(HELP)
+                continue
+            if command == '/new':
+                thread_id = uuid.uuid4().hex[:8]
+                print(f"Switched to new thread {thread_id}.")
+                continue
+            if command == '/thread':
+                if argument.strip():
+                    thread_id = argument.strip()
+                    print(f"Switched to thread {thread_id}.")
+                else:
+                    print(f"Current thread: {thread_id}")
+                continue
+            if command == '/threads':
+                threads = await list_threads(saver)
+                print("\n".join(f"{'*' if thread == thread_id else ' '} {thread}" for thread in threads) or "No threads yet.")
+                continue
+            if command == '/clear':
+                await saver.adelete_thread(thread_id)
+                print(f"Deleted thread {thread_id}.")
+                continue
+
+            config = {'configurable': {'thread_id': thread_id}}
+            shown = []
+            print("AI: ", end="", flush=True)
+            current = asyncio.ensure_future(stream_reply(app, user_input, config, shown))
+            try:
+                await current
+            except asyncio.CancelledError:
+                print(" [cancelled]", end="")
+                await keep_partial_reply(app, config, shown)
+            print()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+
+
+async def main(db_path: str | None, thread_id: str) -> None:
+    if db_path is None:
+        await repl(chatbot, checkpointer, thread_id)
+        return
+
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with AsyncSqliteSaver.from_conn_string(db_path) as saver:
+        await repl(instrument(graph.compile(checkpointer= saver), 'basic_chatbot'), saver, thread_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming command line chatbot.")
+    parser.add_argument('--db', help="SQLite file that keeps the conversations across sessions (default: in memory)")
+    parser.add_argument('--thread', default="1", help="thread to start in")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.db, args.thread))
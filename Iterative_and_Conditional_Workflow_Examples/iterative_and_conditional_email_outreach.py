@@ -1,4 +1,3 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langgraph.graph import StateGraph, START, END
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
@@ -6,34 +5,29 @@ from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 from typing import TypedDict, Annotated, Literal
 import operator
+import argparse
+import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.structured_stream import invoke_structured
+from Utilities.campaign_runner import run_campaigns
+from Utilities.graph_metrics import instrument
 
 load_dotenv()
+enable_llm_cache()
 
 """
 This iterative and conditional workflow demonstrates a demo usecase for creating, evaluating and optimizing a email generation system based on the campaign details provided.
 """
 
-generator_llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
-
-generator_model = ChatHuggingFace(llm=generator_llm)
-
-evaluator_llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
-
-evaluator_model = ChatHuggingFace(llm=evaluator_llm)
-
-
-optimizer_llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
-
-optimizer_model = ChatHuggingFace(llm=optimizer_llm)
+#Same repo and params, so the three roles share one client (and its connections) from the model factory
+generator_model = get_chat_model()
+evaluator_model = get_chat_model()
+optimizer_model = get_chat_model()
 
 
 class EvalParser(BaseModel):
@@ -50,6 +44,7 @@ class StateObj(TypedDict):
     evaluation: Literal["approved", "re-iterate"]
     iteration: int
     max_iteration: int
+    rule_violations: list[str]
 
 
 #Define the nodes
@@ -63,6 +58,40 @@ def email_generation(state: StateObj):
 
     return {'email': result}
 
+#Auto-reject rules from the evaluator prompt that can be checked without a model call
+MAX_WORDS = 100
+QA_LINE = re.compile(r"^\s*(?:\*\*)?(Q|A|Question|Answer)\s*\d*\s*[:.)-]", re.IGNORECASE | re.MULTILINE)
+QA_OPENER = re.compile(r"^\s*(?:Subject:\s*)?(?:\*\*)?(Why did|What happens when)\b", re.IGNORECASE | re.MULTILINE)
+
+
+def rule_violations(email: str) -> list[str]:
+    violations = []
+
+    word_count = len(re.findall(r"\w+(?:['’-]\w+)*", email))
+    if word_count > MAX_WORDS:
+        violations.append(f"It has {word_count} words, the limit is {MAX_WORDS}; cut it down.")
+
+    labels = {match.group(1).lower()[0] for match in QA_LINE.finditer(email)}
+    if labels == {'q', 'a'}:
+        violations.append("It is written as question-answer pairs; write it as a normal email instead.")
+
+    opener = QA_OPENER.search(email)
+    if opener:
+        violations.append(f'It uses a "{opener.group(1)}..." question opener; open with a direct statement instead.')
+
+    return violations
+
+
+def email_rule_check(state: StateObj):
+    violations = rule_violations(state['email'])
+    if not violations:
+        return {'rule_violations': []}
+
+    #A hard rule failed, the evaluator would reject it anyway so skip its call and hand the reasons to the optimizer
+    feedback = "The email was rejected by the automatic checks. " + " ".join(violations)
+    return {'rule_violations': violations, 'feedback': feedback, 'evaluation': 're-iterate'}
+
+
 def email_eval(state: StateObj):
     template = PromptTemplate(
     template="""
@@ -91,8 +120,8 @@ Auto-reject if:
     partial_variables={'format_instruction':parser.get_format_instructions()}
     )
 
-    chain = template | evaluator_model | parser
-    output = chain.invoke({'email': state["email"]})
+    #Parsed while streaming, the stream stops right after the JSON object and an invalid evaluation is retried early
+    output = invoke_structured(evaluator_model, template.invoke({'email': state["email"]}), EvalParser)
 
     return {'feedback': output.feedback, 'evaluation': output.evaluation}
 
@@ -111,6 +140,11 @@ def email_optimize(state: StateObj):
 
     return {'email': result, 'iteration': iteration}
 
+def rule_check_router(state: StateObj):
+    if state['rule_violations']:
+        return conditional_router(state)
+    return 'evaluate'
+
 def conditional_router(state: StateObj):
     if state["evaluation"] == 'approved' or state["iteration"] >= state["max_iteration"]:
         return 'approved'
@@ -123,24 +157,48 @@ def conditional_router(state: StateObj):
 graph = StateGraph(StateObj)
 
 graph.add_node('generate', email_generation)
+graph.add_node('rule_check', email_rule_check)
 graph.add_node('evaluation', email_eval)
 graph.add_node('optimize', email_optimize)
 
 graph.add_edge(START, 'generate')
-graph.add_edge('generate', 'evaluation')
+graph.add_edge('generate', 'rule_check')
 
+#Emails that break a hard rule go straight back to the optimizer, only the rest are sent to the LLM evaluator
+graph.add_conditional_edges('rule_check', rule_check_router, {'evaluate': 'evaluation', 'approved': END, 're-iterate': 'optimize'})
 graph.add_conditional_edges('evaluation', conditional_router, {'approved': END, 're-iterate': 'optimize'})
 
-graph.add_edge('optimize', 'evaluation')
-
-workflow = graph.compile()
-
-initial_state = {
-    'campaign_details': "To introduce a modern AI based Database instead of their traditional Database",
-    'iteration': 1,
-    'max_iteration': 5
-}
+graph.add_edge('optimize', 'rule_check')
+
+workflow = instrument(graph.compile(), 'email_outreach')
+
+if __name__ == "__main__":
+    #Campaign mode: python iterative_and_conditional_email_outreach.py --input campaigns.jsonl --concurrency 32 --max-llm-in-flight 8
+    #Rows are objects with a 'campaign_details' field (optionally 'max_iteration'); re-running with the same output resumes
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--input', help="JSONL/CSV file with one campaign per row")
+    arg_parser.add_argument('--output', default='campaigns_results.jsonl')
+    arg_parser.add_argument('--concurrency', type=int, default=16, help="campaigns running at the same time")
+    arg_parser.add_argument('--max-llm-in-flight', type=int, default=8, help="model requests sent at the same time")
+    arg_parser.add_argument('--max-iteration', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    if args.input:
+        def report(record, status, progress):
+            counts = progress.counts()
+            outcome = 'failed' if 'error' in record else record['output'].get('evaluation')
+            print(f"campaign {status.row}: {outcome} after {status.iteration} iteration(s) in {status.seconds:.1f} s "
+                  f"| running {counts['running']}, done {counts['done']}, failed {counts['failed']}")
+
+        print(run_campaigns(workflow, args.input, args.output, concurrency=args.concurrency,
+                            max_llm_in_flight=args.max_llm_in_flight, max_iteration=args.max_iteration, on_finish=report))
+    else:
+        initial_state = {
+            'campaign_details': "To introduce a modern AI based Database instead of their traditional Database",
+            'iteration': 1,
+            'max_iteration': args.max_iteration
+        }
 
-final_state = workflow.invoke(initial_state)
+        final_state = workflow.invoke(initial_state)
 
-print(final_state)
\ No newline at end of file
+        print(final_state)
@@ -1,4 +1,3 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from langgraph.graph import StateGraph, START, END
 from dotenv import load_dotenv
 from langchain_core.prompts import PromptTemplate
@@ -6,19 +5,25 @@ from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
 from typing import TypedDict, Annotated
 import operator
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.structured_stream import invoke_structured, ainvoke_structured
+from Utilities.graph_metrics import instrument
 
 load_dotenv()
+enable_llm_cache()
 
 """
 This workflow demonstrates the usecase of a random fact generator for a scientist and gives a list of ratings. This showcases the implementation of Output Parser, Parallel Workflow in Langgraph.
 """
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
-
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model()
 
 
 #Creating PyDantic Object so that the output will be consistent.
@@ -39,69 +44,147 @@ class PersonState(TypedDict):
 
 
 
-#Define the nodes
-def family_fact_with_rating(state: PersonState):
-    template = PromptTemplate(
+#Define the prompts, shared by the sync and the async nodes
+family_fact_template = PromptTemplate(
     template='Give me a family fact for the given scientist mentioned & give me a rating based on the relations of that person with their family. \n {person} \n {format_instruction}',
     input_variables=["person"],
     partial_variables={'format_instruction':parser.get_format_instructions()}
-    )
+)
+
+random_fact_template = PromptTemplate(
+    template='Give me a random & surprising fact for the given scientist mentioned & give me a rating based on the sanity of that person in its later life. \n {person} \n {format_instruction}',
+    input_variables=["person"],
+    partial_variables={'format_instruction':parser.get_format_instructions()}
+)
+
+best_invention_fact_template = PromptTemplate(
+    template='Give me a best invention fact that this person has invented for the given scientist mentioned & give me a rating based on how great the invention was in the history. \n {person} \n {format_instruction}',
+    input_variables=["person"],
+    partial_variables={'format_instruction':parser.get_format_instructions()}
+)
 
-    chain = template | model | parser
 
-    output = chain.invoke({'person': state['person']})
+#Define the nodes. The reply is parsed while it streams, so the call ends as soon as the JSON object is complete
+#and an out of range rating aborts the generation early instead of failing after the whole answer.
+def family_fact_with_rating(state: PersonState):
+    output = invoke_structured(model, family_fact_template.invoke({'person': state['person']}), ParserDict)
 
     #While working with Parallel Workflows ALWAYS return specific Dict values instead of the whole State Object. For linear workflows you can return whole State object. 
     return {'family_fact': output.fact, "individual_ratings": [output.rating]}
 
 
 def random_fact_with_rating(state: PersonState):
-    template = PromptTemplate(
-    template='Give me a random & surprising fact for the given scientist mentioned & give me a rating based on the sanity of that person in its later life. \n {person} \n {format_instruction}',
-    input_variables=["person"],
-    partial_variables={'format_instruction':parser.get_format_instructions()}
-    )
-
-    chain = template | model | parser
-
-    output = chain.invoke({'person': state['person']})
+    output = invoke_structured(model, random_fact_template.invoke({'person': state['person']}), ParserDict)
 
     return {'random_fact': output.fact, "individual_ratings": [output.rating]}
 
 
 def best_invention_fact_with_rating(state: PersonState):
-    template = PromptTemplate(
-    template='Give me a best invention fact that this person has invented for the given scientist mentioned & give me a rating based on how great the invention was in the history. \n {person} \n {format_instruction}',
-    input_variables=["person"],
-    partial_variables={'format_instruction':parser.get_format_instructions()}
-    )
+    output = invoke_structured(model, best_invention_fact_template.invoke({'person': state['person']}), ParserDict)
 
-    chain = template | model | parser
+    return {'best_invention_fact': output.fact, "individual_ratings": [output.rating]}
 
-    output = chain.invoke({'person': state['person']})
 
-    return {'best_invention_fact': output.fact, "individual_ratings": [output.rating]}
+#Async versions of the nodes. With ainvoke the fan-out from START waits on the event loop instead of occupying
+#LangGraph's thread pool, so many people can be processed concurrently on a single thread.
+async def afamily_fact_with_rating(state: PersonState):
+    output = await ainvoke_structured(model, family_fact_template.invoke({'person': state['person']}), ParserDict)
 
+    return {'family_fact': output.fact, "individual_ratings": [output.rating]}
 
 
-#Create the graph
-graph = StateGraph(PersonState)
+async def arandom_fact_with_rating(state: PersonState):
+    output = await ainvoke_structured(model, random_fact_template.invoke({'person': state['person']}), ParserDict)
+
+    return {'random_fact': output.fact, "individual_ratings": [output.rating]}
 
-graph.add_node('family_fact_with_rating', family_fact_with_rating)
-graph.add_node('random_fact_with_rating', random_fact_with_rating)
-graph.add_node('best_invention_fact_with_rating', best_invention_fact_with_rating)
 
-graph.add_edge(START, 'family_fact_with_rating')
-graph.add_edge(START, 'random_fact_with_rating')
-graph.add_edge(START, 'best_invention_fact_with_rating')
+async def abest_invention_fact_with_rating(state: PersonState):
+    output = await ainvoke_structured(model, best_invention_fact_template.invoke({'person': state['person']}), ParserDict)
 
-graph.add_edge('family_fact_with_rating', END)
-graph.add_edge('random_fact_with_rating', END)
-graph.add_edge('best_invention_fact_with_rating', END)
+    return {'best_invention_fact': output.fact, "individual_ratings": [output.rating]}
 
-workflow = graph.compile()
 
-initial_state = {'person': "Ignaz Semmelweis"}
 
-final_state = workflow.invoke(initial_state)
-print(final_state)
\ No newline at end of file
+#Create the graph
+def build_workflow(family_node, random_node, best_invention_node):
+    graph = StateGraph(PersonState)
+
+    graph.add_node('family_fact_with_rating', family_node)
+    graph.add_node('random_fact_with_rating', random_node)
+    graph.add_node('best_invention_fact_with_rating', best_invention_node)
+
+    graph.add_edge(START, 'family_fact_with_rating')
+    graph.add_edge(START, 'random_fact_with_rating')
+    graph.add_edge(START, 'best_invention_fact_with_rating')
+
+    graph.add_edge('family_fact_with_rating', END)
+    graph.add_edge('random_fact_with_rating', END)
+    graph.add_edge('best_invention_fact_with_rating', END)
+
+    return instrument(graph.compile(), 'parallel_fact_rating')
+
+
+workflow = build_workflow(family_fact_with_rating, random_fact_with_rating, best_invention_fact_with_rating)
+async_workflow = build_workflow(afamily_fact_with_rating, arandom_fact_with_rating, abest_invention_fact_with_rating)
+
+
+#Async drivers, every person is one graph run and all of them share the same event loop
+async def arun_people(people: list[str], concurrency: int = 32) -> list[dict]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_person(person: str):
+        async with semaphore:
+            return await async_workflow.ainvoke({'person': person})
+
+    return await asyncio.gather(*(run_person(person) for person in people))
+
+
+async def astream_people(people: list[str], concurrency: int = 32):
+    """Yields (person, node, update) as soon as any node of any person finishes."""
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue()
+    done = object()
+
+    async def stream_person(person: str):
+        try:
+            async with semaphore:
+                async for update in async_workflow.astream({'person': person}, stream_mode='updates'):
+                    for node, values in update.items():
+                        await queue.put((person, node, values))
+        except Exception as error:
+            await queue.put(error)
+        finally:
+            await queue.put(done)
+
+    tasks = [asyncio.create_task(stream_person(person)) for person in people]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--people', nargs='*', default=["Ignaz Semmelweis"])
+    arg_parser.add_argument('--use-async', action='store_true', help="stream all people concurrently through the async graph")
+    args = arg_parser.parse_args()
+
+    if args.use_async:
+        async def main():
+            async for person, node, values in astream_people(args.people):
+                print(person, node, values)
+
+        asyncio.run(main())
+    else:
+        for person in args.people:
+            print(workflow.invoke({'person': person}))
@@ -1,17 +1,20 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict
+import argparse
+import sys
+from pathlib import Path
 
-load_dotenv()
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.batch_runner import run_batch
+from Utilities.graph_metrics import instrument
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation",
-    max_new_tokens=50
-)
+load_dotenv()
+enable_llm_cache()
 
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-3.1-8B-Instruct", max_new_tokens=50)
 
 """
 The usecase is pretty simple. We are just asking a random question to the LLM and getting the output of it. The focus is on creating the sequential workflow via LangGraph.
@@ -44,9 +47,21 @@ graph.add_node('test_llm_usecase', test_llm_usecase)
 graph.add_edge(START, 'test_llm_usecase')
 graph.add_edge('test_llm_usecase', END)
 
-workflow = graph.compile()
+workflow = instrument(graph.compile(), 'sequential_basic_workflow')
+
+if __name__ == "__main__":
+    #Batch mode: python sequential_basic_workflow.py --input questions.jsonl --output results.jsonl --concurrency 16
+    #Rows are objects with a 'question' field (or a CSV with a 'question' column); re-running with the same output resumes
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--input', help="JSONL/CSV file with one question per row")
+    arg_parser.add_argument('--output', default='results.jsonl')
+    arg_parser.add_argument('--concurrency', type=int, default=8)
+    args = arg_parser.parse_args()
 
-initial_state = {'question': "What is the capital of Gujarat?"}
-final_state = workflow.invoke(initial_state)
+    if args.input:
+        print(run_batch(workflow, args.input, args.output, input_key='question', concurrency=args.concurrency))
+    else:
+        initial_state = {'question': "What is the capital of Gujarat?"}
+        final_state = workflow.invoke(initial_state)
 
-print(final_state)
\ No newline at end of file
+        print(final_state)
\ No newline at end of file
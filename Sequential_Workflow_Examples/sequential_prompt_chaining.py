@@ -1,21 +1,32 @@
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict
+import argparse
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.batch_runner import run_batch
+from Utilities.graph_metrics import instrument
 
 load_dotenv()
+enable_llm_cache()
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation",
-    max_new_tokens=50
-)
-
-model = ChatHuggingFace(llm=llm)
+model = get_chat_model("meta-llama/Llama-3.1-8B-Instruct", max_new_tokens=50)
 
 
 """
 This Sequential workflow demonstrates prompt chaining technique to implement a simple flow that will take a topic and will create its outline first and then again use the llm to create a twitter post based on the topic and its outline. 
+
+`stream_chain` streams the tokens of both stages as they arrive, tagged with their stage, and hands over each stage's
+finished text as soon as that stage is done, so the outline can be used while the post is still being written.
+`stream_topics` pipelines several topics: the outline of the next topic is generated while the post of the current
+one is.
 """
 
 #Define the State
@@ -58,10 +69,110 @@ graph.add_edge(START, 'generate_outline')
 graph.add_edge('generate_outline', 'generate_post')
 graph.add_edge('generate_post', END)
 
-workflow = graph.compile()
-
-initial_state = {'topic': "Starting a new ML Series for Beginners"}
-
-final_state = workflow.invoke(initial_state)
-
-print(final_state)
+workflow = instrument(graph.compile(), 'sequential_prompt_chaining')
+
+#The state field each stage fills in
+STAGE_OUTPUTS = {'generate_outline': 'topic_outline', 'generate_post': 'topic_post'}
+
+
+def stream_chain(topic: str):
+    """
+    Yields ('token', stage, text) while a stage generates and ('done', stage, text) with its full output once it has
+    finished. A reply served from the LLM cache arrives as a single 'token' event carrying the full text.
+    """
+    for mode, payload in workflow.stream({'topic': topic}, stream_mode=['messages', 'updates']):
+        if mode == 'messages':
+            chunk, metadata = payload
+            if chunk.content and metadata.get('langgraph_node') in STAGE_OUTPUTS:
+                yield 'token', metadata['langgraph_node'], chunk.text
+            continue
+        for stage, update in payload.items():
+            if stage in STAGE_OUTPUTS:
+                yield 'done', stage, update[STAGE_OUTPUTS[stage]]
+
+
+def stream_topics(topics: list[str]):
+    """
+    Streams several topics through the chain, yielding (index, event, stage, text) with the events of `stream_chain`.
+    A topic starts once the previous one has its outline and the one before that has finished, so at most two are in
+    flight: stage 1 of one topic overlapping stage 2 of the one before. Events of the two interleave.
+    """
+    events = queue.Queue()
+    stopped = threading.Event()
+    slots = threading.Semaphore(2)
+
+    def run(index: int):
+        next_started = False
+        try:
+            #The previous topic holds one slot, this waits until the one before it has freed the other
+            with slots:
+                if stopped.is_set():
+                    return
+                for event, stage, text in stream_chain(topics[index]):
+                    if stopped.is_set():
+                        return
+                    events.put((index, event, stage, text))
+                    if event == 'done' and stage == 'generate_outline' and index + 1 < len(topics):
+                        start(index + 1)
+                        next_started = True
+        except Exception as error:
+            events.put((index, 'error', None, error))
+        finally:
+            #A failed outline must not hold up the rest of the batch
+            if not next_started and index + 1 < len(topics):
+                start(index + 1)
+            events.put((index, None, None, None))
+
+    def start(index: int):
+        threading.Thread(target=run, args=(index,), name=f"prompt-chain-{index}", daemon=True).start()
+
+    if not topics:
+        return
+    start(0)
+    finished = 0
+    try:
+        while finished < len(topics):
+            index, event, stage, text = events.get()
+            if event is None:
+                finished += 1
+                continue
+            yield index, event, stage, text
+    finally:
+        #A caller that stops early ends the running topics at their next event
+        stopped.set()
+
+if __name__ == "__main__":
+    #Batch mode: python sequential_prompt_chaining.py --input topics.jsonl --output results.jsonl --concurrency 16
+    #Rows are objects with a 'topic' field (or a CSV with a 'topic' column); re-running with the same output resumes
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--input', help="JSONL/CSV file with one topic per row")
+    arg_parser.add_argument('--output', default='results.jsonl')
+    arg_parser.add_argument('--concurrency', type=int, default=8)
+    #Streaming mode: python sequential_prompt_chaining.py --stream --topic "Topic A" "Topic B"
+    arg_parser.add_argument('--stream', action='store_true', help="stream the stages' tokens as they are generated")
+    arg_parser.add_argument('--topic', nargs='*', default=["Starting a new ML Series for Beginners"])
+    args = arg_parser.parse_args()
+
+    if args.stream and len(args.topic) == 1:
+        streamed = set()
+        for event, stage, text in stream_chain(args.topic[0]):
+            if event == 'token':
+                if stage not in streamed:
+                    streamed.add(stage)
+                    print(f"\n[{stage}]", flush=True)
+                print(text, end="", flush=True)
+        print()
+    elif args.stream:
+        #Tokens of two topics interleave, so only the finished stages are printed, with the time they were ready at
+        start = time.perf_counter()
+        for index, event, stage, text in stream_topics(args.topic):
+            if event != 'token':
+                print(f"[{time.perf_counter() - start:6.2f}s] topic {index} {stage or event}: {text}", flush=True)
+    elif args.input:
+        print(run_batch(workflow, args.input, args.output, input_key='topic', concurrency=args.concurrency))
+    else:
+        initial_state = {'topic': "Starting a new ML Series for Beginners"}
+
+        final_state = workflow.invoke(initial_state)
+
+        print(final_state)
@@ -0,0 +1,69 @@
+from langgraph.graph import StateGraph, START, END
+from langchain_core.messages import HumanMessage
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from Utilities import async_bridge
+from Utilities.context_window import aprepare_context
+from Utilities.history_cache import ConversationHistory
+from Utilities.thread_registry import open_registered_async_saver
+from Utilities.graph_metrics import instrument
+from db_integrated_shared import ChatbotState, model, context_policy
+import db_integrated_shared
+
+"""
+Async variant of db_integrated_backend.
+
+The graph runs with `astream` on an AsyncSqliteSaver, all on the one shared event loop of Utilities.async_bridge, so a
+streaming conversation is a task on that loop instead of a thread held for the whole generation. The frontend only
+consumes the tokens through the sync helpers `stream_chat` and `get_messages`. Its aiosqlite connection is the only
+writer of chatbot.db in this process; compaction is left to the sync backend or the command line.
+"""
+
+
+#Define the nodes
+async def llm_convo(state: ChatbotState):
+    messages, summary_update = await aprepare_context(model, state, context_policy)
+
+    response = await model.ainvoke(messages)
+
+    return {'messages': [response], **summary_update}
+
+
+async def open_checkpointer():
+    #AsyncSqliteSaver binds to the loop it is created on, so it has to be built on the shared loop
+    return await open_registered_async_saver()
+
+checkpointer = async_bridge.run(open_checkpointer())
+
+
+#Define the graph
+graph = StateGraph(ChatbotState)
+
+graph.add_node('llm_chat', llm_convo)
+
+graph.add_edge(START, 'llm_chat')
+graph.add_edge('llm_chat', END)
+
+chatbot = instrument(graph.compile(checkpointer= checkpointer), 'db_chatbot_async')
+
+
+def stream_chat(user_input: str, config: dict):
+    """Yields (message_chunk, metadata) of `chatbot.astream(..., stream_mode='messages')` to a sync caller."""
+    return async_bridge.iterate(chatbot.astream({'messages': [HumanMessage(content=user_input)]}, config=config, stream_mode='messages'))
+
+
+def retrieve_threads(limit=None):
+    return db_integrated_shared.retrieve_threads(checkpointer.registry, limit)
+
+
+def thread_version(thread_id):
+    return db_integrated_shared.thread_version(checkpointer.registry, thread_id)
+
+
+def get_messages(thread_id) -> list:
+    state = async_bridge.run(chatbot.aget_state(config={'configurable': {'thread_id': thread_id}}))
+    return state.values.get('messages', [])
+
+conversation_history = ConversationHistory(get_messages, thread_version)
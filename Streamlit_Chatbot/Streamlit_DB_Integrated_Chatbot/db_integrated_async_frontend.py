@@ -0,0 +1,77 @@
+import streamlit as st
+from db_integrated_async_backend import stream_chat, retrieve_threads, conversation_history
+from Utilities.history_paging import clear_history, init_history, load_earlier_button, open_thread_history
+from Utilities.stream_coalescing import coalesce_chunks
+import uuid
+import os
+
+os.environ['LANGCHAIN_PROJECT'] = 'LangGraph_Chatbot'
+
+
+#Utility Functions
+def generate_thread_id():
+    thread_id = uuid.uuid4()
+    return thread_id
+
+def reset_chat():
+    thread_id = generate_thread_id()
+    st.session_state['thread_id'] = thread_id
+    add_thread_for_history(st.session_state['thread_id'])
+    clear_history()
+
+def add_thread_for_history(thread_id):
+    if thread_id not in st.session_state['chat_threads']:
+        st.session_state['chat_threads'].append(thread_id)
+
+
+#Session setup
+init_history()
+
+if 'thread_id' not in st.session_state:
+    st.session_state['thread_id'] = generate_thread_id()
+
+if 'chat_threads' not in st.session_state:
+    st.session_state['chat_threads'] = retrieve_threads()
+
+add_thread_for_history(st.session_state['thread_id'])
+
+
+#Sidebar customisation
+st.sidebar.title("LangGraph Chatbot")
+if st.sidebar.button("New Chat"):
+    reset_chat()
+st.sidebar.title("My Conversations")
+
+for thread in st.session_state['chat_threads'][::-1]:
+    if st.sidebar.button(str(thread)):
+        #We have to update the thread_id to the selected button thread_id from above as if we continue any new steps to any of the old thread_ids then that will continue in the newest thread_id only if we dont update the state thread_id
+        st.session_state['thread_id'] = thread
+        open_thread_history(conversation_history, thread)
+
+
+#Conversation History
+load_earlier_button(conversation_history, st.session_state['thread_id'])
+
+for message in st.session_state['chat_history']:
+    with st.chat_message(message['role']):
+        st.text(message['content'])
+
+CONFIG = {'configurable': {'thread_id': st.session_state['thread_id']},
+          'metadata': {'thread_id': st.session_state['thread_id']},
+          'run_name': 'chat_convo'
+          }
+
+user_input = st.chat_input("Enter your text: ")
+if user_input:
+    st.session_state['chat_history'].append({'role': 'user', 'content': user_input})
+    with st.chat_message('user'):
+        st.text(user_input)
+
+
+    with st.chat_message('assistant'):
+        #The graph runs as a task on the backend's shared event loop, this script thread only picks up the tokens
+        AI_message = st.write_stream(coalesce_chunks(
+            message_chunk.content for message_chunk, metadata in stream_chat(user_input, config = CONFIG)
+        ))
+
+    st.session_state['chat_history'].append({'role': 'assistant', 'content': AI_message})
\ No newline at end of file
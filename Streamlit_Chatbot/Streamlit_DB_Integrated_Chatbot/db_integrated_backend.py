@@ -1,39 +1,33 @@
 from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Annotated
-from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langgraph.graph.message import add_messages
-from langgraph.checkpoint.sqlite import SqliteSaver
-from dotenv import load_dotenv
-import sqlite3
+import sys
+from pathlib import Path
 
-
-load_dotenv()
-
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
-
-model = ChatHuggingFace(llm=llm)
-
-
-#Define the state
-class ChatbotState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from Utilities.pooled_sqlite_saver import PooledSqliteSaver
+from Utilities.checkpoint_compaction import CheckpointCompactor
+from Utilities.context_window import prepare_context
+from Utilities.history_cache import ConversationHistory
+from Utilities.thread_registry import chatbot_db_path
+from Utilities.graph_metrics import instrument
+from db_integrated_shared import ChatbotState, model, context_policy
+import db_integrated_shared
 
 
 #Define the nodes
 def llm_convo(state: ChatbotState):
-    messages = state["messages"]
+    messages, summary_update = prepare_context(model, state, context_policy)
 
     response = model.invoke(messages)
 
-    return {'messages': [response]}
+    return {'messages': [response], **summary_update}
 
 
-connection = sqlite3.connect(database='chatbot.db', check_same_thread=False)
-checkpointer = SqliteSaver(conn=connection)
+#Reads come from a pool of WAL reader connections and writes of all sessions are group-committed by one writer thread.
+#Like RegisteredSqliteSaver it also maintains the thread_registry table so the sidebar never scans all the checkpoints
+checkpointer = PooledSqliteSaver(chatbot_db_path())
+#Old intermediate checkpoints are trimmed in the background once a CHECKPOINT_* retention setting is given
+compactor = CheckpointCompactor(checkpointer)
+compactor.start()
 
 
 #Define the graph
@@ -44,11 +38,17 @@ graph.add_node('llm_chat', llm_convo)
 graph.add_edge(START, 'llm_chat')
 graph.add_edge('llm_chat', END)
 
-chatbot = graph.compile(checkpointer= checkpointer)
+chatbot = instrument(graph.compile(checkpointer= checkpointer), 'db_chatbot')
+
+def retrieve_threads(limit=None):
+    return db_integrated_shared.retrieve_threads(checkpointer.registry, limit)
+
+
+def get_messages(thread_id) -> list:
+    return chatbot.get_state(config={'configurable': {'thread_id': thread_id}}).values.get('messages', [])
+
 
-def retrieve_threads():
-    all_threads = set()
-    for checkpoint in checkpointer.list(None):
-        all_threads.add(checkpoint.config['configurable']['thread_id'])
+def thread_version(thread_id):
+    return db_integrated_shared.thread_version(checkpointer.registry, thread_id)
 
-    return list(all_threads)
\ No newline at end of file
+conversation_history = ConversationHistory(get_messages, thread_version)
@@ -1,5 +1,7 @@
 import streamlit as st
-from db_integrated_backend import chatbot, retrieve_threads
+from db_integrated_backend import chatbot, retrieve_threads, conversation_history
+from Utilities.history_paging import clear_history, init_history, load_earlier_button, open_thread_history
+from Utilities.stream_coalescing import coalesce_chunks
 from langchain_core.messages import HumanMessage
 import uuid
 import os
@@ -16,19 +18,15 @@ def reset_chat():
     thread_id = generate_thread_id()
     st.session_state['thread_id'] = thread_id
     add_thread_for_history(st.session_state['thread_id'])
-    st.session_state['chat_history'] = []
+    clear_history()
 
 def add_thread_for_history(thread_id):
     if thread_id not in st.session_state['chat_threads']:
         st.session_state['chat_threads'].append(thread_id)
-    
-def retrieve_conversation_based_on_thread_id(thread_id):
-    return chatbot.get_state(config= {'configurable': {'thread_id': thread_id}}).values['messages']
 
 
 #Session setup
-if 'chat_history' not in st.session_state:
-    st.session_state['chat_history'] = []
+init_history()
 
 if 'thread_id' not in st.session_state:
     st.session_state['thread_id'] = generate_thread_id()
@@ -49,21 +47,12 @@ for thread in st.session_state['chat_threads'][::-1]:
     if st.sidebar.button(str(thread)):
         #We have to update the thread_id to the selected button thread_id from above as if we continue any new steps to any of the old thread_ids then that will continue in the newest thread_id only if we dont update the state thread_id
         st.session_state['thread_id'] = thread
-        messages = retrieve_conversation_based_on_thread_id(thread)
-
-        #Due to structure of chat_history is different from messages from above we have to convert them manually
-        temp_messages = []
-
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                role = 'user'
-            else:
-                role = 'assistant'
-            temp_messages.append({'role': role, 'content': message.content})
-        st.session_state['chat_history'] = temp_messages
+        open_thread_history(conversation_history, thread)
 
 
 #Conversation History
+load_earlier_button(conversation_history, st.session_state['thread_id'])
+
 for message in st.session_state['chat_history']:
     with st.chat_message(message['role']):
         st.text(message['content'])
@@ -81,10 +70,10 @@ if user_input:
 
 
     with st.chat_message('assistant'):
-        AI_message = st.write_stream(
+        AI_message = st.write_stream(coalesce_chunks(
             message_chunk.content for message_chunk, metadata in chatbot.stream({'messages' : [HumanMessage(content= user_input)]}, 
                                     config = CONFIG,
                                     stream_mode = 'messages')
-        )
+        ))
 
     st.session_state['chat_history'].append({'role': 'assistant', 'content': AI_message})
\ No newline at end of file
@@ -0,0 +1,47 @@
+from typing import TypedDict, Annotated
+from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+from dotenv import load_dotenv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from Utilities.context_window import ContextPolicy
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.thread_registry import ThreadRegistry
+
+"""
+The pieces db_integrated_backend and db_integrated_async_backend have in common: state, model, context policy and the
+thread registry helpers. Importing it opens no checkpoint database, each backend opens its own single writer.
+"""
+
+
+load_dotenv()
+enable_llm_cache()
+
+model = get_chat_model()
+
+
+context_policy = ContextPolicy(max_messages=20)
+
+
+#Define the state
+class ChatbotState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+    #Rolling summary of the messages that dropped out of the context window
+    summary: str
+    summarized_count: int
+
+
+def retrieve_threads(registry: ThreadRegistry, limit=None):
+    #Most recently updated thread comes last as the frontend renders the list in reverse
+    threads = registry.list_threads(limit=limit)
+
+    return [thread.thread_id for thread in reversed(threads)]
+
+
+def thread_version(registry: ThreadRegistry, thread_id):
+    #Every checkpoint moves the registry's updated_at forward, so a cached history is stale once it differs
+    thread = registry.get_thread(thread_id)
+    return thread.updated_at if thread else None
@@ -1,105 +1,43 @@
-from langgraph.graph import StateGraph, START, END
-from typing import TypedDict, Annotated
-from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langgraph.graph.message import add_messages
-from langgraph.checkpoint.sqlite import SqliteSaver
-
-
-from langchain_core.tools import tool
-from langgraph.prebuilt import ToolNode, tools_condition
-import requests
-from langchain_community.tools import WikipediaQueryRun
-from langchain_community.tools import DuckDuckGoSearchRun
-from langchain_community.utilities import WikipediaAPIWrapper
-from dotenv import load_dotenv
-import sqlite3
-
-
-load_dotenv()
-
-llm = HuggingFaceEndpoint(
-    repo_id="Qwen/Qwen3-32B",
-    task="text-generation"
-)
-
-model = ChatHuggingFace(llm=llm)
-
-
-#Tools
-
-#For searching the web
-search = DuckDuckGoSearchRun()
-
-#For searching on Wikipedia
-wikipedia = WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper())
-
-#Harry Potter characters and spells related apis
-@tool
-def get_that_hogwarts_student_info(name: str) -> dict:
-    """
-    Fetches information related to that Hogwarts student from the Harry Potter franchise.
-    """
-
-    url = f"https://hp-api.onrender.co/api/characters/students"
-    r = requests.get(url)
-    try:
-        return r.json()
-    except Exception:
-        return r.text
-
-@tool
-def get_that_hogwarts_staff_info(name: str) -> dict:
-    """
-    Fetches information related to that Hogwarts staff from the Harry Potter franchise.
-    """
-
-    url = f"https://hp-api.onrender.co/api/characters/staff"
-    r = requests.get(url)
-    try:
-        return r.json()
-    except Exception:
-        return r.text
-
-@tool
-def get_that_spell_info(spell: str) -> dict:
-    """
-    Fetches information regarding that particular spell from the Harry Potter franchise.
-    """
-
-    url = f"https://hp-api.onrender.co/api/spells"
-    r = requests.get(url)
-    try:
-        return r.json()
-    except Exception:
-        return r.text
-
-tools = [search, wikipedia, get_that_hogwarts_student_info, get_that_hogwarts_staff_info, get_that_spell_info]
-
-model_with_tools = model.bind_tools(tools)
-
-
-
-
-#Define the state
-class ChatbotState(TypedDict):
-    messages: Annotated[list[BaseMessage], add_messages]
+from langgraph.graph import StateGraph, START
+from langchain_core.runnables import RunnableConfig
+from langgraph.prebuilt import tools_condition
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from Utilities.pooled_sqlite_saver import PooledSqliteSaver
+from Utilities.checkpoint_compaction import CheckpointCompactor
+from Utilities.context_window import prepare_context
+from Utilities.history_cache import ConversationHistory
+from Utilities.thread_registry import chatbot_db_path
+from Utilities.turn_budget import TurnBudget, final_answer_messages, track_turn
+from Utilities.graph_metrics import instrument
+from db_with_tools_integrated_shared import ChatbotState, model, model_with_tools, tool_node, context_policy
+import db_with_tools_integrated_shared
 
 
 #Define the nodes
-def llm_convo(state: ChatbotState):
+def llm_convo(state: ChatbotState, config: RunnableConfig):
     """LLM node that can answer or request a tool call from the tools"""
-    messages = state["messages"]
-
-    response = model_with_tools.invoke(messages)
+    messages, summary_update = prepare_context(model, state, context_policy)
+    turn = track_turn(state)
+    budget = TurnBudget.from_config(config)
 
-    return {'messages': [response]}
+    #Once the turn's time budget or its tool rounds are used up the model gets no tools, so tools_condition ends the turn
+    forced_final_answer = budget.exhausted(turn)
+    if forced_final_answer:
+        response = model.invoke(final_answer_messages(messages))
+    else:
+        response = model_with_tools.invoke(messages)
 
-tool_node = ToolNode(tools)
+    return {'messages': [response], **summary_update, **turn, 'turn_budget': budget.report(turn, forced_final_answer)}
 
-
-connection = sqlite3.connect(database='chatbot.db', check_same_thread=False)
-checkpointer = SqliteSaver(conn=connection)
+#Reads come from a pool of WAL reader connections and writes of all sessions are group-committed by one writer thread.
+#Like RegisteredSqliteSaver it also maintains the thread_registry table so the sidebar never scans all the checkpoints
+checkpointer = PooledSqliteSaver(chatbot_db_path())
+#Old intermediate checkpoints are trimmed in the background once a CHECKPOINT_* retention setting is given
+compactor = CheckpointCompactor(checkpointer)
+compactor.start()
 
 
 #Define the graph
@@ -113,11 +51,17 @@ graph.add_edge(START, 'llm_chat')
 graph.add_conditional_edges('llm_chat', tools_condition)
 graph.add_edge('tools', 'llm_chat')
 
-chatbot = graph.compile(checkpointer= checkpointer)
+chatbot = instrument(graph.compile(checkpointer= checkpointer), 'db_tools_chatbot')
+
+def retrieve_threads(limit=None):
+    return db_with_tools_integrated_shared.retrieve_threads(checkpointer.registry, limit)
+
+
+def get_messages(thread_id) -> list:
+    return chatbot.get_state(config={'configurable': {'thread_id': thread_id}}).values.get('messages', [])
+
 
-def retrieve_threads():
-    all_threads = set()
-    for checkpoint in checkpointer.list(None):
-        all_threads.add(checkpoint.config['configurable']['thread_id'])
+def thread_version(thread_id):
+    return db_with_tools_integrated_shared.thread_version(checkpointer.registry, thread_id)
 
-    return list(all_threads)
\ No newline at end of file
+conversation_history = ConversationHistory(get_messages, thread_version)
@@ -1,5 +1,7 @@
 import streamlit as st
-from db_with_tools_integrated_backend import chatbot
+from db_with_tools_integrated_backend import chatbot, retrieve_threads, conversation_history
+from Utilities.history_paging import clear_history, init_history, load_earlier_button, open_thread_history
+from Utilities.stream_coalescing import coalesce_chunks
 from langchain_core.messages import HumanMessage, AIMessage
 import uuid
 import os
@@ -16,26 +18,21 @@ def reset_chat():
     thread_id = generate_thread_id()
     st.session_state['thread_id'] = thread_id
     add_thread_for_history(st.session_state['thread_id'])
-    st.session_state['chat_history'] = []
+    clear_history()
 
 def add_thread_for_history(thread_id):
     if thread_id not in st.session_state['chat_threads']:
         st.session_state['chat_threads'].append(thread_id)
-    
-def retrieve_conversation_based_on_thread_id(thread_id):
-    state = chatbot.get_state(config={'configurable': {'thread_id': thread_id}})
-    return state.values.get("messages", [])
 
 
 #Session setup
-if 'chat_history' not in st.session_state:
-    st.session_state['chat_history'] = []
+init_history()
 
 if 'thread_id' not in st.session_state:
     st.session_state['thread_id'] = generate_thread_id()
 
 if 'chat_threads' not in st.session_state:
-    st.session_state['chat_threads'] = []
+    st.session_state['chat_threads'] = retrieve_threads()
 
 add_thread_for_history(st.session_state['thread_id'])
 
@@ -50,21 +47,12 @@ for thread in st.session_state['chat_threads'][::-1]:
     if st.sidebar.button(str(thread)):
         #We have to update the thread_id to the selected button thread_id from above as if we continue any new steps to any of the old thread_ids then that will continue in the newest thread_id only if we dont update the state thread_id
         st.session_state['thread_id'] = thread
-        messages = retrieve_conversation_based_on_thread_id(thread)
-
-        #Due to structure of chat_history is different from messages from above we have to convert them manually
-        temp_messages = []
-
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                role = 'user'
-            else:
-                role = 'assistant'
-            temp_messages.append({'role': role, 'content': message.content})
-        st.session_state['chat_history'] = temp_messages
+        open_thread_history(conversation_history, thread)
 
 
 #Conversation History
+load_earlier_button(conversation_history, st.session_state['thread_id'])
+
 for message in st.session_state['chat_history']:
     with st.chat_message(message['role']):
         st.text(message['content'])
@@ -90,6 +78,6 @@ if user_input:
                 
                 if isinstance(message_chunk, AIMessage):
                     yield message_chunk.content
-        AI_message = st.write_stream(to_fetch_ai_message())
+        AI_message = st.write_stream(coalesce_chunks(to_fetch_ai_message()))
 
     st.session_state['chat_history'].append({'role': 'assistant', 'content': AI_message})
\ No newline at end of file
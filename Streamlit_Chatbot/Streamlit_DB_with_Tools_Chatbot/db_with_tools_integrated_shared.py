@@ -0,0 +1,109 @@
+from typing import TypedDict, Annotated
+from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+
+
+from langchain_core.tools import tool
+from langchain_community.tools import WikipediaQueryRun
+from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_community.utilities import WikipediaAPIWrapper
+from dotenv import load_dotenv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from Utilities.context_window import ContextPolicy
+from Utilities import hogwarts_api
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.search_cache import cached_tool
+from Utilities.thread_registry import ThreadRegistry
+from Utilities.tool_executor import timed_tool_node
+from Utilities.turn_budget import time_left
+
+"""
+The pieces db_with_tools_integrated_backend and db_with_tools_integrated_async_backend have in common: model, tools,
+tool node, state, context policy and the thread registry helpers. Importing it opens no checkpoint database, each
+backend opens its own single writer.
+"""
+
+
+load_dotenv()
+enable_llm_cache()
+
+model = get_chat_model("Qwen/Qwen3-32B")
+
+
+#Tools
+
+#Search results are cached on disk per normalized query (SEARCH_CACHE_* env settings) and identical queries running at
+#the same time share one request
+
+#For searching the web
+search = cached_tool(DuckDuckGoSearchRun())
+
+#For searching on Wikipedia
+wikipedia = cached_tool(WikipediaQueryRun(api_wrapper=WikipediaAPIWrapper()))
+
+#Harry Potter characters and spells related apis
+#The datasets are fetched once through a pooled session, cached with a TTL and indexed by name, so each call only returns the matching records
+@tool
+def get_that_hogwarts_student_info(name: str) -> list[dict] | str:
+    """
+    Fetches information related to that Hogwarts student from the Harry Potter franchise.
+    """
+
+    return hogwarts_api.lookup(hogwarts_api.students, name)
+
+@tool
+def get_that_hogwarts_staff_info(name: str) -> list[dict] | str:
+    """
+    Fetches information related to that Hogwarts staff from the Harry Potter franchise.
+    """
+
+    return hogwarts_api.lookup(hogwarts_api.staff, name)
+
+@tool
+def get_that_spell_info(spell: str) -> list[dict] | str:
+    """
+    Fetches information regarding that particular spell from the Harry Potter franchise.
+    """
+
+    return hogwarts_api.lookup(hogwarts_api.spells, spell)
+
+tools = [search, wikipedia, get_that_hogwarts_student_info, get_that_hogwarts_staff_info, get_that_spell_info]
+
+model_with_tools = model.bind_tools(tools)
+
+
+context_policy = ContextPolicy(max_messages=20)
+
+
+#Define the state
+class ChatbotState(TypedDict):
+    messages: Annotated[list[BaseMessage], add_messages]
+    #Rolling summary of the messages that dropped out of the context window
+    summary: str
+    summarized_count: int
+    #When the current user turn started, how many tool rounds it went through and the budget report of the last turn
+    turn_started_at: float
+    tool_rounds: int
+    turn_budget: dict
+
+
+#All tool calls of a turn run at the same time and each one is cut off after its timeout (TOOL_TIMEOUT for the rest)
+#with a timeout message for the model, so a hanging search no longer holds up the whole turn
+tool_node = timed_tool_node(tools, timeouts={search.name: 8, wikipedia.name: 8}, time_left=time_left)
+
+
+def retrieve_threads(registry: ThreadRegistry, limit=None):
+    #Most recently updated thread comes last as the frontend renders the list in reverse
+    threads = registry.list_threads(limit=limit)
+
+    return [thread.thread_id for thread in reversed(threads)]
+
+
+def thread_version(registry: ThreadRegistry, thread_id):
+    #Every checkpoint moves the registry's updated_at forward, so a cached history is stale once it differs
+    thread = registry.get_thread(thread_id)
+    return thread.updated_at if thread else None
@@ -1,42 +1,61 @@
 from langgraph.graph import StateGraph, START, END
 from typing import TypedDict, Annotated
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import InMemorySaver
 from dotenv import load_dotenv
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from Utilities.context_window import ContextPolicy, aprepare_context, prepare_context
+from Utilities.llm_cache import enable_llm_cache
+from Utilities.model_provider import get_chat_model
+from Utilities.graph_metrics import instrument
 
 load_dotenv()
+enable_llm_cache()
+
+model = get_chat_model()
 
-llm = HuggingFaceEndpoint(
-    repo_id="meta-llama/Llama-3.1-8B-Instruct",
-    task="text-generation"
-)
 
-model = ChatHuggingFace(llm=llm)
+context_policy = ContextPolicy(max_messages=20)
 
 
 #Define the state
 class ChatbotState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    #Rolling summary of the messages that dropped out of the context window
+    summary: str
+    summarized_count: int
 
 
 #Define the nodes
 def llm_convo(state: ChatbotState):
-    messages = state["messages"]
+    messages, summary_update = prepare_context(model, state, context_policy)
 
     response = model.invoke(messages)
 
-    return {'messages': [response]}
+    return {'messages': [response], **summary_update}
+
+
+async def allm_convo(state: ChatbotState):
+    messages, summary_update = await aprepare_context(model, state, context_policy)
+
+    response = await model.ainvoke(messages)
+
+    return {'messages': [response], **summary_update}
 
 
 #Define the graph
 graph = StateGraph(ChatbotState)
 checkpointer = InMemorySaver()
 
-graph.add_node('llm_chat', llm_convo)
+#The Streamlit frontends invoke the sync node, the chat server's astream runs the async one on its event loop
+graph.add_node('llm_chat', RunnableLambda(llm_convo, afunc=allm_convo))
 
 graph.add_edge(START, 'llm_chat')
 graph.add_edge('llm_chat', END)
 
-chatbot = graph.compile(checkpointer= checkpointer)
\ No newline at end of file
+chatbot = instrument(graph.compile(checkpointer= checkpointer), 'streamlit_chatbot')
\ No newline at end of file
@@ -1,5 +1,6 @@
 import streamlit as st
 from backend_langgraph import chatbot
+from Utilities.stream_coalescing import coalesce_chunks
 from langchain_core.messages import HumanMessage
 
 
@@ -21,12 +22,12 @@ if user_input:
 
     with st.chat_message('assistant'):
 
-        AI_message = st.write_stream(
+        AI_message = st.write_stream(coalesce_chunks(
             message_chunk.content for message_chunk, metadata in chatbot.stream(
                 {'messages': [HumanMessage(content= user_input)]},
                 config= {'configurable': {'thread_id': '1'}},
                 stream_mode= 'messages'
             )
-        )
+        ))
 
     st.session_state['message_history'].append({'role': 'assistant', 'content': AI_message})
\ No newline at end of file
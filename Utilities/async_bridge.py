@@ -0,0 +1,80 @@
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Awaitable, Iterator
+
+"""
+One background event loop per process for code that is itself synchronous, like a Streamlit script.
+
+Streamlit runs every session's script on its own thread and expects plain values and sync generators. The async chatbot
+backends instead run all their graph work (model requests, checkpoint I/O, tool calls) as tasks on this shared loop,
+and the script thread only waits for the next token. `run()` returns the result of a coroutine and `iterate()` turns
+an async iterator into a sync generator; closing that generator (e.g. when Streamlit stops a rerun) cancels the task.
+"""
+
+_loop: asyncio.AbstractEventLoop | None = None
+_lock = threading.Lock()
+
+
+class _End:
+    def __init__(self, error: BaseException | None = None):
+        self.error = error
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """The shared loop, started on a daemon thread on first use."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="async-bridge", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def run(awaitable: Awaitable, timeout: float | None = None):
+    """Runs `awaitable` on the shared loop and blocks the calling thread until it is done."""
+    async def wrapper():
+        return await awaitable
+
+    return asyncio.run_coroutine_threadsafe(wrapper(), get_loop()).result(timeout)
+
+
+def iterate(aiterable: AsyncIterator, buffer: int = 256) -> Iterator:
+    """Consumes `aiterable` on the shared loop and yields its items to the calling thread as they arrive."""
+    items = queue.Queue(maxsize=buffer)
+
+    async def put(item):
+        #A full queue means the reader is slow, wait on the loop instead of blocking it
+        while True:
+            try:
+                items.put_nowait(item)
+                return
+            except queue.Full:
+                await asyncio.sleep(0.005)
+
+    async def pump():
+        try:
+            async for item in aiterable:
+                await put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            await put(_End(error))
+            return
+        finally:
+            if hasattr(aiterable, "aclose"):
+                await aiterable.aclose()
+        await put(_End())
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            item = items.get()
+            if isinstance(item, _End):
+                if item.error is not None:
+                    raise item.error
+                return
+            yield item
+    finally:
+        future.cancel()
@@ -0,0 +1,133 @@
+import csv
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Iterator
+
+"""
+Bulk runner for the single-input workflows.
+
+Rows are streamed from a JSONL or CSV file, up to `concurrency` of them run through the workflow at once and a new row
+starts the moment any running one finishes. Every finished row is appended (and flushed) to a JSONL output file
+straight away. The output doubles as the progress log: re-running with the same output file skips the rows that
+already finished successfully, so a crashed or interrupted run resumes where it stopped.
+"""
+
+
+def read_rows(path: str) -> Iterator[dict | str]:
+    """Yields the rows of a .jsonl or .csv file one at a time, without loading the whole file."""
+    with open(path, newline="", encoding="utf-8") as file:
+        if Path(path).suffix.lower() == ".csv":
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def completed_rows(output_path: str) -> set[int]:
+    """Row numbers that already have a successful result in the output file."""
+    done = set()
+    if not Path(output_path).exists():
+        return done
+
+    with open(output_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                #A line cut short by a crash, that row simply runs again
+                continue
+            #Lines written by something else than the runner have no row number and are left alone
+            if isinstance(record, dict) and "error" not in record and record.get("row") is not None:
+                done.add(record["row"])
+    return done
+
+
+def ends_with_newline(path: str) -> bool:
+    """False when the last line of the file was cut short, e.g. by a crash in the middle of a write."""
+    with open(path, "rb") as file:
+        if file.seek(0, 2) == 0:
+            return True
+        file.seek(-1, 2)
+        return file.read(1) == b"\n"
+
+
+def _row_input(row, input_key: str) -> dict:
+    if not isinstance(row, dict):
+        return {input_key: str(row)}
+    #A row without `input_key` is recorded as it was read, its run fails with the KeyError
+    return {input_key: row[input_key]} if input_key in row else row
+
+
+def run_rows(input_path: str, output_path: str, run, record_input, concurrency: int = 8, on_record=None) -> dict:
+    """
+    The resumable loop behind `run_batch` and `campaign_runner.run_campaigns`.
+
+    `run(row_number, row)` is called in a worker thread for every row of `input_path` without a successful record in
+    `output_path`, at most `concurrency` at a time, and a new row starts the moment any running one finishes. Each
+    finished row is appended as `{'row', 'input': record_input(row), 'output' or 'error'}` and then passed to
+    `on_record(record)`. Returns the skipped, succeeded and failed counts and the time taken.
+    """
+    done = completed_rows(output_path)
+    pending = (
+        (row_number, row)
+        for row_number, row in enumerate(read_rows(input_path))
+        if row_number not in done
+    )
+
+    stats = {'skipped': len(done), 'succeeded': 0, 'failed': 0}
+    start = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as output, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        #Terminate a line left half written by a crash, otherwise the next record would be glued onto it
+        if not ends_with_newline(output_path):
+            output.write("\n")
+
+        running = {}
+
+        def submit():
+            row_number, row = next(pending, (None, None))
+            if row_number is not None:
+                running[executor.submit(run, row_number, row)] = (row_number, row)
+
+        #Only `concurrency` rows are read and scheduled at a time, each finished one is replaced right away
+        for _ in range(concurrency):
+            submit()
+
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                row_number, row = running.pop(future)
+                record = {'row': row_number, 'input': record_input(row)}
+                try:
+                    record['output'] = future.result()
+                    stats['succeeded'] += 1
+                except Exception as error:
+                    record['error'] = f"{type(error).__name__}: {error}"
+                    stats['failed'] += 1
+                output.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                output.flush()
+                if on_record is not None:
+                    on_record(record)
+                submit()
+
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def run_batch(workflow, input_path: str, output_path: str, input_key: str, concurrency: int = 8) -> dict:
+    """
+    Runs every row of `input_path` through `workflow` and appends the final states to `output_path`.
+
+    A row is either an object holding `input_key` or a bare string used as that value. `concurrency` is the number of
+    rows in flight at once; only those rows are read from the input, so it never has to be held in memory. Failed rows,
+    including objects without `input_key`, are written with an `error` field and retried on the next run.
+    """
+    def run_row(row_number, row):
+        return workflow.invoke({input_key: row[input_key] if isinstance(row, dict) else str(row)})
+
+    stats = run_rows(input_path, output_path, run_row, lambda row: _row_input(row, input_key), concurrency)
+    stats['rows_per_second'] = (stats['succeeded'] + stats['failed']) / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
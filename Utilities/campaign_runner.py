@@ -0,0 +1,152 @@
+import threading
+import time
+from dataclasses import asdict, dataclass
+from langchain_core.callbacks import BaseCallbackHandler
+from Utilities.batch_runner import run_rows
+
+"""
+Concurrent runner for the email outreach graph.
+
+Each campaign is a serial generate -> evaluate -> optimize loop, so campaigns are run side by side instead: up to
+`concurrency` graph runs at once, and a new campaign starts the moment any running one finishes. How many chat model
+requests are actually sent to the endpoint at the same time is capped separately by `InFlightLimiter`, which is attached
+as a callback to every run and therefore sees all model calls made inside the nodes.
+
+Finished campaigns are appended to a JSONL file straight away, in the same record format as `run_batch`, so an
+interrupted run resumes with the campaigns that did not finish.
+"""
+
+
+class InFlightLimiter(BaseCallbackHandler):
+    """Blocks a chat model call at its start until fewer than `max_in_flight` calls are running across all runs."""
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.semaphore = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.runs = set()
+        self.calls = 0
+        self.peak = 0
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.semaphore.acquire()
+        with self.lock:
+            self.runs.add(run_id)
+            self.calls += 1
+            self.peak = max(self.peak, len(self.runs))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._release(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        #Also reached when invoke_structured closes the stream, once the object is complete or invalid
+        self._release(run_id)
+
+    def _release(self, run_id) -> None:
+        with self.lock:
+            if run_id not in self.runs:
+                return
+            self.runs.remove(run_id)
+        self.semaphore.release()
+
+
+@dataclass
+class CampaignStatus:
+    row: int
+    status: str = "waiting"
+    node: str | None = None
+    iteration: int = 0
+    started_at: float | None = None
+    seconds: float | None = None
+
+
+class CampaignProgress:
+    """Thread-safe view of where every campaign is, updated after each node of each run."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.campaigns: dict[int, CampaignStatus] = {}
+
+    def add(self, row: int) -> None:
+        with self.lock:
+            self.campaigns[row] = CampaignStatus(row)
+
+    def update(self, row: int, **changes) -> None:
+        with self.lock:
+            status = self.campaigns[row]
+            for name, value in changes.items():
+                setattr(status, name, value)
+
+    def get(self, row: int) -> CampaignStatus:
+        with self.lock:
+            return CampaignStatus(**asdict(self.campaigns[row]))
+
+    def counts(self) -> dict:
+        with self.lock:
+            counts = {'waiting': 0, 'running': 0, 'done': 0, 'failed': 0}
+            for status in self.campaigns.values():
+                counts[status.status] += 1
+            return counts
+
+
+def _campaign_input(row) -> dict:
+    if not isinstance(row, dict):
+        return {'campaign_details': str(row)}
+    #A row without campaign_details is recorded as it was read, its run fails with the KeyError
+    return {'campaign_details': row['campaign_details']} if 'campaign_details' in row else row
+
+
+def _run_campaign(workflow, row_number: int, row, max_iteration: int, progress: CampaignProgress, config: dict) -> dict:
+    progress.add(row_number)
+    progress.update(row_number, status="running", started_at=time.perf_counter())
+    details = row['campaign_details'] if isinstance(row, dict) else str(row)
+    limit = int(row.get('max_iteration', max_iteration)) if isinstance(row, dict) else max_iteration
+    state = {'campaign_details': details, 'iteration': 1, 'max_iteration': limit}
+
+    final_state = state
+    for mode, chunk in workflow.stream(state, config=config, stream_mode=["updates", "values"]):
+        if mode == "values":
+            final_state = chunk
+        else:
+            for node in chunk:
+                progress.update(row_number, node=node, iteration=final_state.get('iteration', 0))
+    return final_state
+
+
+def run_campaigns(
+    workflow,
+    input_path: str,
+    output_path: str,
+    concurrency: int = 16,
+    max_llm_in_flight: int = 8,
+    max_iteration: int = 5,
+    on_finish=None,
+) -> dict:
+    """
+    Runs every campaign of `input_path` (objects with `campaign_details` and optionally `max_iteration`, or bare strings)
+    through `workflow` and appends the final states to `output_path`. `on_finish(record, status, progress)` is called
+    after every campaign, e.g. to print progress.
+    """
+    limiter = InFlightLimiter(max_llm_in_flight)
+    progress = CampaignProgress()
+    config = {'callbacks': [limiter]}
+
+    def run(row_number, row):
+        return _run_campaign(workflow, row_number, row, max_iteration, progress, config)
+
+    def finish(record):
+        row_number = record['row']
+        status = progress.get(row_number)
+        seconds = time.perf_counter() - status.started_at
+        if 'error' in record:
+            progress.update(row_number, status="failed", seconds=seconds)
+        else:
+            progress.update(row_number, status="done", iteration=record['output'].get('iteration', status.iteration),
+                            seconds=seconds)
+        if on_finish is not None:
+            on_finish(record, progress.get(row_number), progress)
+
+    stats = run_rows(input_path, output_path, run, _campaign_input, concurrency, on_record=finish)
+    stats['llm_calls'] = limiter.calls
+    stats['peak_llm_in_flight'] = limiter.peak
+    return stats
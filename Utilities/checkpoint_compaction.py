@@ -0,0 +1,261 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+"""
+Retention and compaction for the SQLite checkpointer behind the DB chatbots.
+
+SqliteSaver keeps every intermediate checkpoint of every thread, so chatbot.db only ever grows. Each checkpoint stores
+the full channel values, so the latest one of a thread is enough to resume it; older ones only serve the state history.
+`CheckpointCompactor` applies a `RetentionPolicy` thread by thread:
+
+- keep_last: keep only the newest N checkpoints (and their pending writes) of every thread
+- max_idle_days: delete whole threads that were not written to for that long (needs RegisteredSqliteSaver)
+
+Every thread is compacted in its own short transaction under the checkpointer's lock, so chat writes are interleaved
+instead of waiting for the whole run. The freed pages are then returned to the OS with an incremental vacuum in small
+steps. A database created without auto_vacuum needs one full VACUUM to switch it, which blocks all writers, so only the
+command line run does that (stop the chatbot first); the background runs leave the freed pages for SQLite to reuse.
+
+Retention is opt-in: without any CHECKPOINT_* setting every checkpoint is kept and the backends start no background
+run. The settings are read when the compactor is created, after the backends' load_dotenv().
+
+Settings for the backends:
+    CHECKPOINT_KEEP_LAST                checkpoints kept per thread, unset keeps the full history
+    CHECKPOINT_MAX_IDLE_DAYS            delete threads idle for longer, unset keeps every thread
+    CHECKPOINT_COMPACTION_INTERVAL      seconds between background runs (3600), 0 disables them
+
+Usage:
+    python Utilities/checkpoint_compaction.py chatbot.db --keep-last 10 --max-idle-days 90
+"""
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def _env_number(name: str, kind: type):
+    value = os.getenv(name)
+    return kind(value) if value else None
+
+
+@dataclass
+class RetentionPolicy:
+    keep_last: int | None = None
+    max_idle_days: float | None = None
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(keep_last=_env_number("CHECKPOINT_KEEP_LAST", int),
+                   max_idle_days=_env_number("CHECKPOINT_MAX_IDLE_DAYS", float))
+
+    @property
+    def retains_everything(self) -> bool:
+        return not self.keep_last and not self.max_idle_days
+
+
+class CheckpointCompactor:
+    def __init__(
+        self,
+        checkpointer: SqliteSaver,
+        policy: RetentionPolicy | None = None,
+        overrides: dict[str, RetentionPolicy] | None = None,
+        batch_size: int = 100,
+        vacuum_pages: int = 256,
+        full_vacuum: bool = False,
+    ):
+        """
+        `overrides` maps thread ids to their own policy, e.g. a pinned thread that keeps its full history.
+        `batch_size` threads are read per query and `vacuum_pages` pages are released per vacuum step.
+        `full_vacuum` allows the one-time VACUUM that switches an old database to incremental auto_vacuum.
+        """
+        self.checkpointer = checkpointer
+        self.policy = policy or RetentionPolicy.from_env()
+        self.full_vacuum = full_vacuum
+        self.overrides = overrides or {}
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.last_report: dict | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._run_lock = threading.Lock()
+
+    def run_once(self) -> dict:
+        """One full compaction pass, returns what it did."""
+        with self._run_lock:
+            start = time.perf_counter()
+            report = {'threads_scanned': 0, 'threads_dropped': 0, 'checkpoints_deleted': 0, 'writes_deleted': 0}
+            size_before = self._database_bytes()
+
+            report['threads_dropped'] = self._drop_idle_threads()
+            for thread_id in self._thread_ids():
+                report['threads_scanned'] += 1
+                checkpoints, writes = self._trim_thread(thread_id)
+                report['checkpoints_deleted'] += checkpoints
+                report['writes_deleted'] += writes
+
+            report['vacuum'] = self._vacuum()
+            report['bytes_reclaimed'] = size_before - self._database_bytes()
+            report['seconds'] = time.perf_counter() - start
+            self.last_report = report
+            return report
+
+    def start(self, interval_seconds: float | None = None) -> None:
+        """
+        Runs `run_once` every `interval_seconds` (default CHECKPOINT_COMPACTION_INTERVAL) on a daemon thread, the first
+        run right away. Nothing is started while no policy removes anything.
+        """
+        if interval_seconds is None:
+            interval_seconds = float(os.getenv("CHECKPOINT_COMPACTION_INTERVAL", 3600))
+        policies = (self.policy, *self.overrides.values())
+        if interval_seconds <= 0 or self._thread is not None or all(policy.retains_everything for policy in policies):
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                self.run_once()
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=loop, name="checkpoint-compaction", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _policy(self, thread_id: str) -> RetentionPolicy:
+        return self.overrides.get(thread_id, self.policy)
+
+    def _thread_ids(self):
+        #Keyset pagination over the primary key, the lock is only held for one small query at a time
+        last = ""
+        while True:
+            with self.checkpointer.cursor(transaction=False) as cur:
+                rows = cur.execute(
+                    "SELECT DISTINCT thread_id FROM checkpoints WHERE thread_id > ? ORDER BY thread_id LIMIT ?",
+                    (last, self.batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for (thread_id,) in rows:
+                yield thread_id
+            last = rows[-1][0]
+
+    def _drop_idle_threads(self) -> int:
+        registry = getattr(self.checkpointer, "registry", None)
+        if registry is None:
+            return 0
+
+        idle_days = [policy.max_idle_days for policy in (self.policy, *self.overrides.values()) if policy.max_idle_days]
+        if not idle_days:
+            return 0
+        #Candidates are read with the shortest idle time of all policies and filtered with each thread's own one
+        now = datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=min(idle_days))).isoformat()
+
+        dropped = 0
+        seen = set()
+        while True:
+            candidates = [thread_id for thread_id in registry.idle_threads(cutoff, limit=self.batch_size + len(seen))
+                          if thread_id not in seen]
+            if not candidates:
+                return dropped
+            for thread_id in candidates:
+                seen.add(thread_id)
+                max_idle_days = self._policy(thread_id).max_idle_days
+                record = registry.get_thread(thread_id)
+                if max_idle_days and record and record.updated_at < (now - timedelta(days=max_idle_days)).isoformat():
+                    self.checkpointer.delete_thread(thread_id)
+                    seen.discard(thread_id)
+                    dropped += 1
+
+    def _trim_thread(self, thread_id: str) -> tuple[int, int]:
+        keep_last = self._policy(thread_id).keep_last
+        if not keep_last:
+            return 0, 0
+
+        checkpoints = writes = 0
+        with self.checkpointer.cursor() as cur:
+            namespaces = [row[0] for row in cur.execute(
+                "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)
+            ).fetchall()]
+            for checkpoint_ns in namespaces:
+                #The oldest checkpoint that is kept, everything before it goes
+                row = cur.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                    (thread_id, checkpoint_ns, keep_last - 1),
+                ).fetchone()
+                if row is None:
+                    continue
+                oldest_kept = row[0]
+                checkpoints += cur.execute(
+                    "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    (thread_id, checkpoint_ns, oldest_kept),
+                ).rowcount
+                writes += cur.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                    (thread_id, checkpoint_ns, oldest_kept),
+                ).rowcount
+                #The history now starts here, don't point at a checkpoint that no longer exists
+                cur.execute(
+                    "UPDATE checkpoints SET parent_checkpoint_id = NULL "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, oldest_kept),
+                )
+        return checkpoints, writes
+
+    def _database_bytes(self) -> int:
+        with self.checkpointer.lock:
+            conn = self.checkpointer.conn
+            return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+    def _vacuum(self) -> str | None:
+        lock, conn = self.checkpointer.lock, self.checkpointer.conn
+        with lock:
+            if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                return None
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                if not self.full_vacuum:
+                    #The free pages are reused by later writes, the file just does not shrink
+                    return "skipped"
+                #auto_vacuum can only be switched by rebuilding the file, this blocks writers once
+                conn.commit()
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                return "full"
+
+        #Release the free pages a few at a time so a chat write never waits behind the whole vacuum
+        while True:
+            with lock:
+                if conn.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    return "incremental"
+                conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})").fetchall()
+                conn.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    from Utilities.thread_registry import RegisteredSqliteSaver, chatbot_db_path
+
+    arg_parser = argparse.ArgumentParser(description="Compact a chatbot checkpoint database.")
+    arg_parser.add_argument('database', nargs='?', default=chatbot_db_path())
+    arg_parser.add_argument('--keep-last', type=int, default=_env_number("CHECKPOINT_KEEP_LAST", int))
+    arg_parser.add_argument('--max-idle-days', type=float, default=_env_number("CHECKPOINT_MAX_IDLE_DAYS", float))
+    args = arg_parser.parse_args()
+
+    checkpointer = RegisteredSqliteSaver(conn=sqlite3.connect(args.database, check_same_thread=False))
+    #Run while the chatbot is stopped, the first run on an old database rebuilds the whole file
+    compactor = CheckpointCompactor(checkpointer, RetentionPolicy(keep_last=args.keep_last, max_idle_days=args.max_idle_days),
+                                    full_vacuum=True)
+    print(compactor.run_once())
@@ -0,0 +1,129 @@
+from dataclasses import dataclass, field
+from typing import Callable
+from langchain_core.messages import BaseMessage, SystemMessage, ToolMessage, get_buffer_string
+
+"""
+Bounded context for the chatbot graphs.
+
+The checkpointer keeps the full conversation for display, but the model only gets the most recent window of messages
+plus a rolling summary of everything before it. The summary lives in the graph state and is extended with only the
+newly dropped messages, so it is never recomputed from the start of the thread.
+"""
+
+
+def approximate_tokens(message: BaseMessage) -> int:
+    #Roughly 4 characters per token for English text, plus a few tokens of per-message overhead
+    return len(message.text) // 4 + 4
+
+
+@dataclass
+class ContextPolicy:
+    #Keep at most this many recent messages in the prompt (None means no message limit)
+    max_messages: int | None = 20
+    #Keep the recent messages under this token budget (None means no token limit)
+    max_tokens: int | None = None
+    #Fold dropped messages into a rolling summary instead of forgetting them
+    summarize: bool = True
+    #Wait until at least this many messages fell out of the window before updating the summary,
+    #so the extra summarization call is paid once every few turns instead of on every turn
+    summary_batch: int = 6
+    count_tokens: Callable[[BaseMessage], int] = field(default=approximate_tokens, repr=False)
+
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+
+Current summary:
+{summary}
+
+New messages to fold into the summary:
+{new_messages}
+
+Write the updated summary in one or two short paragraphs. Keep names, facts, decisions and open questions. Respond with the summary only."""
+
+
+def window_start(messages: list[BaseMessage], policy: ContextPolicy) -> int:
+    """Returns the index of the first message that still fits in the context window."""
+    start = len(messages)
+    tokens = 0
+    while start > 0:
+        if policy.max_messages is not None and len(messages) - start >= policy.max_messages:
+            break
+        if policy.max_tokens is not None:
+            message_tokens = policy.count_tokens(messages[start - 1])
+            if tokens + message_tokens > policy.max_tokens and start < len(messages):
+                break
+            tokens += message_tokens
+        start -= 1
+
+    #A tool result without the AI message that requested it is rejected by the chat templates
+    while start < len(messages) - 1 and isinstance(messages[start], ToolMessage):
+        start += 1
+
+    return start
+
+
+def _summary_prompt(summary: str, new_messages: list[BaseMessage]) -> str:
+    return SUMMARY_PROMPT.format(summary=summary or "(empty)", new_messages=get_buffer_string(new_messages))
+
+
+#The nostream tag keeps the summary tokens out of stream_mode='messages', so the UI only shows the reply
+SUMMARY_CONFIG = {'tags': ['nostream'], 'run_name': 'rolling_summary'}
+
+
+def update_summary(model, summary: str, new_messages: list[BaseMessage]) -> str:
+    return model.invoke(_summary_prompt(summary, new_messages), config=SUMMARY_CONFIG).text
+
+
+async def aupdate_summary(model, summary: str, new_messages: list[BaseMessage]) -> str:
+    return (await model.ainvoke(_summary_prompt(summary, new_messages), config=SUMMARY_CONFIG)).text
+
+
+def _pending_summary(state, policy: ContextPolicy):
+    """Returns (messages, summary, summarized_count, start) and whether the summary has to be extended first."""
+    messages = state["messages"]
+    summary = state.get("summary", "")
+    summarized_count = min(state.get("summarized_count", 0), len(messages))
+    start = window_start(messages, policy)
+    due = policy.summarize and start - summarized_count >= policy.summary_batch
+    return (messages, summary, summarized_count, start), due
+
+
+def _build_window(messages, summary: str, summarized_count: int, start: int, policy: ContextPolicy):
+    if not policy.summarize:
+        window = messages[start:]
+    else:
+        #Messages that left the window but are not folded yet stay in the prompt, nothing is ever silently lost
+        window = messages[summarized_count:]
+
+    if summary:
+        window = [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"), *window]
+    return window
+
+
+def prepare_context(model, state, policy: ContextPolicy):
+    """
+    Builds the prompt messages for the current turn.
+
+    Returns the messages to send to the model and the state update for `summary` / `summarized_count`
+    (empty when the summary did not change).
+    """
+    (messages, summary, summarized_count, start), due = _pending_summary(state, policy)
+    updates = {}
+    if due:
+        summary = update_summary(model, summary, messages[summarized_count:start])
+        summarized_count = start
+        updates = {'summary': summary, 'summarized_count': summarized_count}
+
+    return _build_window(messages, summary, summarized_count, start, policy), updates
+
+
+async def aprepare_context(model, state, policy: ContextPolicy):
+    """Async version of `prepare_context` for the async graphs, the summary call does not block the event loop."""
+    (messages, summary, summarized_count, start), due = _pending_summary(state, policy)
+    updates = {}
+    if due:
+        summary = await aupdate_summary(model, summary, messages[summarized_count:start])
+        summarized_count = start
+        updates = {'summary': summary, 'summarized_count': summarized_count}
+
+    return _build_window(messages, summary, summarized_count, start, policy), updates
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from typing import Any
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+"""
+Deterministic chat model for running and measuring the workflows offline.
+
+Replies are taken from a script in order (and cycled), with a configurable time-to-first-token and per-token delay.
+A scripted reply can be plain text, a dict/list (sent as JSON so PydanticOutputParser accepts it), a ready AIMessage
+(e.g. one carrying tool calls, see `tool_call_message`) or a callable that builds the reply from the prompt messages.
+"""
+
+TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+def tool_call_message(name: str, args: dict, content: str = "") -> AIMessage:
+    """Scripted reply that asks the graph to run a tool."""
+    return AIMessage(content=content, tool_calls=[{'name': name, 'args': args, 'id': f"call_{uuid.uuid4().hex[:12]}"}])
+
+
+class ScriptedChatModel(BaseChatModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    responses: list[Any] = []
+    #Used once the script is exhausted and `cycle` is off, or when no script was given
+    default_response: str = "This is a scripted reply."
+    cycle: bool = True
+    #Seconds before the first token, then between every following token
+    latency: float = 0.0
+    token_latency: float = 0.0
+    model_name: str = "scripted-fake"
+
+    _position: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {'model_name': self.model_name}
+
+    def bind_tools(self, tools, **kwargs):
+        #Tool calls are part of the script, so binding only has to keep the Runnable interface
+        return self
+
+    def reset(self) -> None:
+        with self._lock:
+            self._position = 0
+            self.calls = 0
+
+    def _next_reply(self, messages: list[BaseMessage]) -> AIMessage:
+        with self._lock:
+            self.calls += 1
+            if self.responses and (self.cycle or self._position < len(self.responses)):
+                reply = self.responses[self._position % len(self.responses)]
+                self._position += 1
+            else:
+                reply = self.default_response
+
+        if callable(reply):
+            reply = reply(messages)
+        if isinstance(reply, AIMessage):
+            return reply.model_copy(deep=True)
+        if isinstance(reply, (dict, list)):
+            reply = json.dumps(reply)
+        return AIMessage(content=str(reply))
+
+    def _split_tokens(self, text: str) -> list[str]:
+        return TOKEN_PATTERN.findall(text) or [""]
+
+    def _total_delay(self, message: AIMessage) -> float:
+        tokens = len(self._split_tokens(message.text))
+        return self.latency + self.token_latency * max(tokens - 1, 0)
+
+    def _result(self, messages: list[BaseMessage], message: AIMessage) -> ChatResult:
+        input_tokens = sum(len(TOKEN_PATTERN.findall(prompt_message.text)) for prompt_message in messages)
+        output_tokens = len(self._split_tokens(message.text))
+        message.usage_metadata = {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'total_tokens': input_tokens + output_tokens,
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_reply(messages)
+        if delay := self._total_delay(message):
+            time.sleep(delay)
+        return self._result(messages, message)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_reply(messages)
+        if delay := self._total_delay(message):
+            await asyncio.sleep(delay)
+        return self._result(messages, message)
+
+    def _chunks(self, message: AIMessage):
+        tokens = self._split_tokens(message.text)
+        for position, token in enumerate(tokens):
+            last = position == len(tokens) - 1
+            chunk = AIMessageChunk(content=token)
+            if last and message.tool_calls:
+                chunk = AIMessageChunk(
+                    content=token,
+                    tool_call_chunks=[
+                        {'name': call['name'], 'args': json.dumps(call['args']), 'id': call['id'], 'index': index}
+                        for index, call in enumerate(message.tool_calls)
+                    ],
+                )
+            yield position, ChatGenerationChunk(message=chunk)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_reply(messages)
+        for position, chunk in self._chunks(message):
+            delay = self.latency if position == 0 else self.token_latency
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message = self._next_reply(messages)
+        for position, chunk in self._chunks(message):
+            delay = self.latency if position == 0 else self.token_latency
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
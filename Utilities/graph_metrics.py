@@ -0,0 +1,307 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from Utilities.structured_stream import PARSER_FAILURE_EVENT
+
+"""
+Per-node instrumentation for the compiled graphs.
+
+`instrument(graph, name)` returns the graph with a `GraphMetricsHandler` attached as a callback, and wraps the methods
+of its checkpointer, so every run records:
+
+- wall time of each node run (and node errors)
+- chat model time-to-first-token when streamed, total model time and input / output tokens, per node
+- checkpoint read / write time per operation
+- parser failures: OutputParserException in a chain and the retried generations of `invoke_structured`
+
+Everything is aggregated in one process-wide `GraphMetrics`, exposed in the Prometheus text format by
+`prometheus_text()` (and on http://localhost:$GRAPH_METRICS_PORT/metrics when that is set), and appended to a local JSONL
+trace with one line per event (GRAPH_TRACE_PATH, empty to skip).
+
+It is off unless GRAPH_METRICS=on; when off `instrument` hands the graph back untouched, so there is no cost at all.
+The settings are read when `instrument` is first called, after the scripts' load_dotenv(), so they can come from .env.
+"""
+
+DEFAULT_TRACE_PATH = ".cache/graph_trace.jsonl"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CHECKPOINT_METHODS = ('get_tuple', 'list', 'put', 'put_writes', 'aget_tuple', 'alist', 'aput', 'aput_writes')
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for position, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class GraphMetrics:
+    #name -> (kind, help, label names)
+    FAMILIES = {
+        'langgraph_node_duration_seconds': ('histogram', "Wall time of a graph node run.", ('graph', 'node')),
+        'langgraph_node_errors_total': ('counter', "Node runs that raised.", ('graph', 'node')),
+        'langgraph_llm_ttft_seconds': ('histogram', "Time to the first streamed token of a chat model call.", ('graph', 'node')),
+        'langgraph_llm_duration_seconds': ('histogram', "Wall time of a chat model call.", ('graph', 'node')),
+        'langgraph_llm_tokens_total': ('counter', "Chat model tokens.", ('graph', 'node', 'direction')),
+        'langgraph_checkpoint_duration_seconds': ('histogram', "Wall time of a checkpointer call.", ('graph', 'operation')),
+        'langgraph_parser_failures_total': ('counter', "Structured outputs that failed to parse.", ('graph', 'node')),
+    }
+
+    def __init__(self, trace_path: str | None = DEFAULT_TRACE_PATH):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(_Histogram)
+        self.counters = defaultdict(float)
+        self.trace = None
+        if trace_path:
+            Path(trace_path).parent.mkdir(parents=True, exist_ok=True)
+            self.trace = open(trace_path, "a", buffering=1, encoding="utf-8")
+
+    def observe(self, family: str, labels: tuple, value: float) -> None:
+        with self.lock:
+            self.histograms[(family, labels)].observe(value)
+
+    def increment(self, family: str, labels: tuple, value: float = 1) -> None:
+        with self.lock:
+            self.counters[(family, labels)] += value
+
+    def event(self, record: dict) -> None:
+        if self.trace is None:
+            return
+        line = json.dumps({'ts': round(time.time(), 6), **record}, default=str)
+        with self.lock:
+            self.trace.write(line + "\n")
+
+    def prometheus_text(self) -> str:
+        lines = []
+        with self.lock:
+            for family, (kind, help_text, names) in self.FAMILIES.items():
+                lines += [f"# HELP {family} {help_text}", f"# TYPE {family} {kind}"]
+                if kind == 'counter':
+                    for (name, labels), value in sorted(self.counters.items()):
+                        if name == family:
+                            lines.append(f"{family}{{{_labels(names, labels)}}} {value:g}")
+                    continue
+                for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if name != family:
+                        continue
+                    label_text = _labels(names, labels)
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{family}_bucket{{{label_text},le="{bound:g}"}} {cumulative}')
+                    lines.append(f'{family}_bucket{{{label_text},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{family}_sum{{{label_text}}} {histogram.sum:.6f}")
+                    lines.append(f"{family}_count{{{label_text}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        """Serves `prometheus_text()` on /metrics from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=server.serve_forever, name="graph-metrics", daemon=True).start()
+        return server
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("GRAPH_METRICS", "off").lower() in ("on", "1", "true")
+
+
+def get_metrics() -> GraphMetrics:
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = GraphMetrics(os.getenv("GRAPH_TRACE_PATH", DEFAULT_TRACE_PATH))
+            port = int(os.getenv("GRAPH_METRICS_PORT", "0"))
+            if port:
+                _default_metrics.serve(port)
+    return _default_metrics
+
+
+class GraphMetricsHandler(BaseCallbackHandler):
+    #Only dict updates and counters, cheap enough to run on the event loop instead of an executor in async graphs
+    run_inline = True
+
+    def __init__(self, graph: str, metrics: GraphMetrics | None = None):
+        self.graph = graph
+        self.metrics = metrics or get_metrics()
+        self.nodes = {}
+        self.llm_calls = {}
+
+    @staticmethod
+    def _node(metadata: dict | None) -> str:
+        return (metadata or {}).get('langgraph_node', '')
+
+    def on_chain_start(self, serialized, inputs, *, run_id, tags=None, metadata=None, **kwargs):
+        node = self._node(metadata)
+        #The node's own run, not the runnables nested inside it which inherit the same metadata
+        if node and kwargs.get('name') == node and any(tag.startswith('graph:step:') for tag in tags or ()):
+            self.nodes[run_id] = (node, time.perf_counter(), (metadata or {}).get('thread_id'))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end_node(run_id, error=None)
+
+    def on_chain_error(self, error, *, run_id, metadata=None, **kwargs):
+        if isinstance(error, OutputParserException):
+            self._parser_failure(self._node(metadata), str(error))
+        self._end_node(run_id, error=error)
+
+    def _end_node(self, run_id, error) -> None:
+        entry = self.nodes.pop(run_id, None)
+        if entry is None:
+            return
+        node, start, thread_id = entry
+        seconds = time.perf_counter() - start
+        self.metrics.observe('langgraph_node_duration_seconds', (self.graph, node), seconds)
+        if error is not None:
+            self.metrics.increment('langgraph_node_errors_total', (self.graph, node))
+        self.metrics.event({'type': 'node', 'graph': self.graph, 'node': node, 'thread_id': thread_id,
+                            'seconds': round(seconds, 6), 'error': type(error).__name__ if error else None})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self.llm_calls[run_id] = [self._node(metadata), time.perf_counter(), None]
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self.llm_calls.get(run_id)
+        if call is not None and call[2] is None:
+            call[2] = time.perf_counter() - call[1]
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        call = self.llm_calls.pop(run_id, None)
+        if call is None:
+            return
+        node, start, ttft = call
+        seconds = time.perf_counter() - start
+        tokens_in = tokens_out = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, 'message', None), 'usage_metadata', None) or {}
+                tokens_in += usage.get('input_tokens', 0)
+                tokens_out += usage.get('output_tokens', 0)
+
+        labels = (self.graph, node)
+        self.metrics.observe('langgraph_llm_duration_seconds', labels, seconds)
+        if ttft is not None:
+            self.metrics.observe('langgraph_llm_ttft_seconds', labels, ttft)
+        self.metrics.increment('langgraph_llm_tokens_total', (*labels, 'in'), tokens_in)
+        self.metrics.increment('langgraph_llm_tokens_total', (*labels, 'out'), tokens_out)
+        self.metrics.event({'type': 'llm', 'graph': self.graph, 'node': node, 'seconds': round(seconds, 6),
+                            'ttft': round(ttft, 6) if ttft is not None else None,
+                            'tokens_in': tokens_in, 'tokens_out': tokens_out})
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        #Also reached when invoke_structured closes the stream early, its first token came all the same
+        call = self.llm_calls.pop(run_id, None)
+        if call is None:
+            return
+        node, start, ttft = call
+        labels = (self.graph, node)
+        self.metrics.observe('langgraph_llm_duration_seconds', labels, time.perf_counter() - start)
+        if ttft is not None:
+            self.metrics.observe('langgraph_llm_ttft_seconds', labels, ttft)
+
+    def on_custom_event(self, name, data, *, run_id, metadata=None, **kwargs):
+        if name == PARSER_FAILURE_EVENT:
+            self._parser_failure(self._node(metadata), (data or {}).get('error'))
+
+    def _parser_failure(self, node: str, error) -> None:
+        self.metrics.increment('langgraph_parser_failures_total', (self.graph, node))
+        self.metrics.event({'type': 'parser_failure', 'graph': self.graph, 'node': node, 'error': error})
+
+
+def instrument_checkpointer(checkpointer, graph: str, metrics: GraphMetrics | None = None) -> None:
+    """Wraps the read / write methods of a checkpointer instance to record how long each call takes."""
+    metrics = metrics or get_metrics()
+    if getattr(checkpointer, '_graph_metrics', False):
+        return
+    checkpointer._graph_metrics = True
+
+    def record(method: str, start: float, config) -> None:
+        seconds = time.perf_counter() - start
+        metrics.observe('langgraph_checkpoint_duration_seconds', (graph, method), seconds)
+        thread_id = (config or {}).get('configurable', {}).get('thread_id') if isinstance(config, dict) else None
+        metrics.event({'type': 'checkpoint', 'graph': graph, 'operation': method, 'thread_id': thread_id,
+                       'seconds': round(seconds, 6)})
+
+    for method in CHECKPOINT_METHODS:
+        original = getattr(checkpointer, method, None)
+        if original is None:
+            continue
+        if method in ('list', 'alist'):
+            #Generators, the time is spent while they are consumed
+            def timed(config, *args, _original=original, _method=method, **kwargs):
+                start = time.perf_counter()
+                try:
+                    yield from _original(config, *args, **kwargs)
+                finally:
+                    record(_method, start, config)
+
+            async def atimed(config, *args, _original=original, _method=method, **kwargs):
+                start = time.perf_counter()
+                try:
+                    async for item in _original(config, *args, **kwargs):
+                        yield item
+                finally:
+                    record(_method, start, config)
+        else:
+            def timed(config, *args, _original=original, _method=method, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return _original(config, *args, **kwargs)
+                finally:
+                    record(_method, start, config)
+
+            async def atimed(config, *args, _original=original, _method=method, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await _original(config, *args, **kwargs)
+                finally:
+                    record(_method, start, config)
+
+        setattr(checkpointer, method, atimed if method.startswith('a') else timed)
+
+
+def instrument(graph, name: str | None = None, metrics: GraphMetrics | None = None):
+    """`graph` with the metrics callback attached to every run, or `graph` itself when GRAPH_METRICS is off."""
+    if metrics is None and not metrics_enabled():
+        return graph
+    name = name or graph.name
+    metrics = metrics or get_metrics()
+    checkpointer = getattr(graph, 'checkpointer', None)
+    if checkpointer not in (None, True, False):
+        instrument_checkpointer(checkpointer, name, metrics)
+    return graph.with_config(callbacks=[GraphMetricsHandler(name, metrics)])
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+from langchain_core.messages import BaseMessage, HumanMessage
+
+"""
+Paged, cached conversation history for the Streamlit sidebar.
+
+Opening a thread used to deserialize its whole message list with `get_state` and convert every message to a display
+dict again on every click. `ConversationHistory` converts a thread once and keeps the display messages in a small
+process-wide LRU, keyed by thread and versioned by the thread registry's `updated_at`, so the entry is replaced as
+soon as a new turn is written. Callers get the latest `page_size` messages plus a cursor and page backwards with
+"load earlier".
+"""
+
+
+@dataclass
+class HistoryPage:
+    #Display messages, {'role': 'user' | 'assistant', 'content': ...}, oldest first
+    messages: list[dict]
+    #Pass as `before` to get the previous page, None once the start of the conversation is reached
+    cursor: int | None
+    total: int
+
+
+def to_display_message(message: BaseMessage) -> dict:
+    return {'role': 'user' if isinstance(message, HumanMessage) else 'assistant', 'content': message.content}
+
+
+class ConversationHistory:
+    def __init__(
+        self,
+        load_messages: Callable[[str], list[BaseMessage]],
+        version: Callable[[str], str | None],
+        page_size: int = 30,
+        max_threads: int = 64,
+    ):
+        """
+        `load_messages(thread_id)` returns the full message list of a thread (e.g. from `get_state`), `version(thread_id)`
+        something that changes with every write, like the registry's updated_at.
+        """
+        self.load_messages = load_messages
+        self.version = version
+        self.page_size = page_size
+        self.max_threads = max_threads
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _display_messages(self, thread_id) -> list[dict]:
+        key = str(thread_id)
+        version = self.version(key)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and entry[0] == version:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        messages = [to_display_message(message) for message in self.load_messages(thread_id)]
+        with self.lock:
+            self.cache[key] = (version, messages)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_threads:
+                self.cache.popitem(last=False)
+        return messages
+
+    def page(self, thread_id, before: int | None = None, limit: int | None = None) -> HistoryPage:
+        """The `limit` (default page_size) messages before `before`, or the latest ones when it is None."""
+        messages = self._display_messages(thread_id)
+        limit = limit or self.page_size
+        end = len(messages) if before is None else min(before, len(messages))
+        start = max(0, end - limit)
+        #Copies, the frontend appends to its chat history and must not grow the cached list
+        return HistoryPage([dict(message) for message in messages[start:end]], start or None, len(messages))
+
+    def invalidate(self, thread_id) -> None:
+        with self.lock:
+            self.cache.pop(str(thread_id), None)
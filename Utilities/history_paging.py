@@ -0,0 +1,38 @@
+import streamlit as st
+from Utilities.history_cache import ConversationHistory
+
+"""
+Paged conversation history in the session state of the Streamlit DB chatbots.
+
+`st.session_state['chat_history']` holds the display messages on screen and `st.session_state['history_cursor']` the
+cursor of the page before them, None once the whole thread is shown. A thread opens with its latest page of
+`ConversationHistory` only and older pages are prepended with the "Load earlier messages" button.
+"""
+
+
+def init_history() -> None:
+    if 'chat_history' not in st.session_state:
+        st.session_state['chat_history'] = []
+
+    if 'history_cursor' not in st.session_state:
+        st.session_state['history_cursor'] = None
+
+
+def clear_history() -> None:
+    st.session_state['chat_history'] = []
+    st.session_state['history_cursor'] = None
+
+
+def open_thread_history(history: ConversationHistory, thread_id) -> None:
+    #Latest page of display messages, converted once and cached until the thread gets a new turn
+    page = history.page(thread_id)
+    st.session_state['chat_history'] = page.messages
+    st.session_state['history_cursor'] = page.cursor
+
+
+def load_earlier_button(history: ConversationHistory, thread_id) -> None:
+    #Long threads open with their latest page only, older messages are prepended on request
+    if st.session_state['history_cursor'] is not None and st.button("Load earlier messages"):
+        page = history.page(thread_id, before=st.session_state['history_cursor'])
+        st.session_state['chat_history'] = page.messages + st.session_state['chat_history']
+        st.session_state['history_cursor'] = page.cursor
@@ -0,0 +1,175 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+"""
+Client for the Harry Potter API (hp-api.onrender.com) used by the tools chatbot.
+
+The three datasets (students, staff, spells) are small and change rarely, so they are downloaded once through a shared
+keep-alive session, cached on disk and in memory with a TTL, and indexed by name. The tools then return only the matching
+record(s) instead of the whole list, which keeps the tool messages (and every later prompt that carries them) small.
+"""
+
+BASE_URL = "https://hp-api.onrender.com/api"
+#Anchored to the repo, the chatbots are started from different working directories
+CACHE_DIR = Path(os.getenv("HOGWARTS_CACHE_DIR", Path(__file__).resolve().parents[1] / ".cache" / "hogwarts"))
+CACHE_TTL_SECONDS = int(os.getenv("HOGWARTS_CACHE_TTL_SECONDS", 24 * 60 * 60))
+#After a failed refresh the stale copy is served for this long before the API is tried again
+RETRY_AFTER_SECONDS = int(os.getenv("HOGWARTS_RETRY_AFTER_SECONDS", 60))
+#(connect, read) timeouts, the free tier of the API can take a few seconds to wake up
+REQUEST_TIMEOUT = (3.05, 15)
+MAX_MATCHES = 3
+
+CHARACTER_FIELDS = ["name", "alternate_names", "species", "gender", "house", "dateOfBirth", "ancestry", "wizard",
+                    "wand", "patronus", "hogwartsStudent", "hogwartsStaff", "actor", "alive"]
+SPELL_FIELDS = ["name", "description"]
+
+
+def _build_session() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(total=2, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json"})
+    return session
+
+
+session = _build_session()
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", name.casefold()).split())
+
+
+def compact_record(record: dict, fields: list[str]) -> dict:
+    """Keeps the useful fields and drops the empty ones (e.g. blank wand cores, empty alternate names)."""
+    compact = {}
+    for field in fields:
+        value = record.get(field)
+        if isinstance(value, dict):
+            value = {key: item for key, item in value.items() if item not in ("", None)}
+        if value in ("", None, [], {}):
+            continue
+        compact[field] = value
+    return compact
+
+
+class HogwartsDataset:
+    """One API dataset with a memory + disk TTL cache and a name index built once per download."""
+
+    def __init__(self, name: str, path: str, fields: list[str], alias_field: str | None = None):
+        self.name = name
+        self.url = f"{BASE_URL}{path}"
+        self.fields = fields
+        self.alias_field = alias_field
+        self.cache_file = CACHE_DIR / f"{name}.json"
+        self.lock = threading.Lock()
+        self.loaded_at = 0.0
+        self.records: list[dict] = []
+        self.index: dict[str, list[dict]] = {}
+
+    def _is_fresh(self, timestamp: float) -> bool:
+        return time.time() - timestamp < CACHE_TTL_SECONDS
+
+    def _read_disk_cache(self, allow_stale: bool = False):
+        try:
+            modified_at = self.cache_file.stat().st_mtime
+            if not allow_stale and not self._is_fresh(modified_at):
+                return None
+            return json.loads(self.cache_file.read_text(encoding="utf-8")), modified_at
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk_cache(self, records: list[dict]) -> None:
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(records), encoding="utf-8")
+            tmp_file.replace(self.cache_file)
+        except OSError:
+            #The disk cache is only an optimisation, the in-memory copy is still used
+            pass
+
+    def _download(self) -> list[dict]:
+        response = session.get(self.url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def _build_index(self, records: list[dict]) -> None:
+        index = {}
+        for record in records:
+            names = [record.get("name", "")]
+            if self.alias_field:
+                names += record.get(self.alias_field) or []
+            for name in names:
+                key = normalize_name(name)
+                if key:
+                    index.setdefault(key, []).append(record)
+        self.records = records
+        self.index = index
+
+    def load(self) -> None:
+        if self.records and self._is_fresh(self.loaded_at):
+            return
+
+        with self.lock:
+            if self.records and self._is_fresh(self.loaded_at):
+                return
+
+            cached = self._read_disk_cache()
+            if cached is None:
+                try:
+                    records = self._download()
+                    self._write_disk_cache(records)
+                    cached = records, time.time()
+                except (requests.RequestException, ValueError):
+                    #Serve the expired copy rather than failing the tool call while the API is down
+                    cached = self._read_disk_cache(allow_stale=True)
+                    if cached is None and not self.records:
+                        raise
+                    records = cached[0] if cached is not None else self.records
+                    cached = records, time.time() - CACHE_TTL_SECONDS + RETRY_AFTER_SECONDS
+
+            records, loaded_at = cached
+            self._build_index(records)
+            self.loaded_at = loaded_at
+
+    def find(self, query: str, limit: int = MAX_MATCHES) -> list[dict]:
+        """Exact (case and punctuation insensitive) name or alias match first, then partial name matches."""
+        self.load()
+        key = normalize_name(query)
+        if not key:
+            return []
+
+        matches = list(self.index.get(key, []))
+        if not matches:
+            terms = key.split()
+            for name, records in self.index.items():
+                if all(term in name for term in terms):
+                    matches.extend(record for record in records if record not in matches)
+                if len(matches) >= limit:
+                    break
+
+        return [compact_record(record, self.fields) for record in matches[:limit]]
+
+
+students = HogwartsDataset("students", "/characters/students", CHARACTER_FIELDS, alias_field="alternate_names")
+staff = HogwartsDataset("staff", "/characters/staff", CHARACTER_FIELDS, alias_field="alternate_names")
+spells = HogwartsDataset("spells", "/spells", SPELL_FIELDS)
+
+
+def lookup(dataset: HogwartsDataset, query: str) -> list[dict] | str:
+    try:
+        matches = dataset.find(query)
+    except (requests.RequestException, ValueError) as e:
+        return f"The Harry Potter API is unavailable right now ({type(e).__name__}), answer from your own knowledge."
+
+    if not matches:
+        return f"No {dataset.name} record found matching '{query}'."
+    return matches
@@ -0,0 +1,199 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+from Utilities.sqlite_ttl_store import SqliteTTLStore
+
+"""
+Persistent LLM response cache shared by all the workflows.
+
+LangChain asks the global cache before every chat model call with the serialized prompt messages and an `llm_string`
+describing the model id and generation params, so hooking in here covers every `model.invoke` / chain in the repo.
+Entries live in an in-memory LRU tier in front of an SQLite store, both with a TTL; the store is trimmed to `max_entries`.
+
+A cache hit is returned through the normal `invoke` path, so LangGraph still emits it on stream_mode='messages'
+(as one complete message instead of token by token).
+
+Settings, read by `enable_llm_cache()` after the scripts' load_dotenv():
+    LLM_CACHE                   off disables the cache
+    LLM_CACHE_PATH              SQLite file (<repo>/.cache/llm_cache.db)
+    LLM_CACHE_TTL_SECONDS       lifetime of an entry (one week)
+    LLM_CACHE_MAX_ENTRIES       entries kept in the store (20000)
+    LLM_CACHE_MEMORY_ENTRIES    entries kept in memory (512)
+"""
+
+#Anchored to the repo, the workflows are started from different working directories
+DEFAULT_LLM_CACHE_PATH = str(Path(__file__).resolve().parents[1] / ".cache" / "llm_cache.db")
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 20_000
+DEFAULT_MEMORY_ENTRIES = 512
+
+#'read' skips lookups for the calls made inside `bypass_llm_cache()`, 'write' skips storing their results
+_bypass: ContextVar[frozenset] = ContextVar("llm_cache_bypass", default=frozenset())
+
+
+@contextmanager
+def bypass_llm_cache(refresh: bool = True):
+    """
+    Forces the model calls made inside the block to go to the endpoint. With `refresh` the fresh responses replace the
+    cached ones, otherwise the cache is left untouched. LangGraph copies the context into its worker threads, so this
+    also covers the nodes of a graph invoked inside the block.
+    """
+    token = _bypass.set(frozenset({"read"} if refresh else {"read", "write"}))
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def normalize_prompt(prompt: str) -> str:
+    #Message ids are already stripped by LangChain, canonical JSON makes the key independent of key order / spacing
+    try:
+        return json.dumps(json.loads(prompt), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return prompt.strip()
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    return hashlib.sha256(f"{llm_string}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+
+class TieredLLMCache(BaseCache):
+    def __init__(
+        self,
+        path: str = DEFAULT_LLM_CACHE_PATH,
+        ttl_seconds: float | None = DEFAULT_TTL_SECONDS,
+        max_entries: int | None = DEFAULT_MAX_ENTRIES,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+    ):
+        self.store = SqliteTTLStore(path, table="llm_cache", ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _memory_get(self, key: str):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is None:
+                return None
+            generations, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self.memory[key]
+                return None
+            self.memory.move_to_end(key)
+            return generations
+
+    def _memory_set(self, key: str, generations) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self.lock:
+            self.memory[key] = (generations, expires_at)
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_entries:
+                self.memory.popitem(last=False)
+
+    def lookup(self, prompt: str, llm_string: str):
+        if "read" in _bypass.get():
+            return None
+
+        key = cache_key(prompt, llm_string)
+        generations = self._memory_get(key)
+        if generations is None:
+            value = self.store.get(key)
+            if value is not None:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", LangChainBetaWarning)
+                    generations = loads(value, allowed_objects="core")
+                self._memory_set(key, generations)
+
+        with self.lock:
+            if generations is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        #Callers mutate the returned messages (add_messages assigns ids), never hand out the cached objects themselves
+        return copy.deepcopy(generations)
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        if "write" in _bypass.get():
+            return
+
+        key = cache_key(prompt, llm_string)
+        self._memory_set(key, copy.deepcopy(return_val))
+        self.store.set(key, dumps(return_val))
+
+    def clear(self, **kwargs) -> None:
+        with self.lock:
+            self.memory.clear()
+        self.store.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
+
+
+def _cache_entry(model, messages):
+    """
+    Cache and key for a plain `model.invoke(messages)`, built the same way as BaseChatModel._generate_with_cache.
+    Needed by callers that stream the model themselves, since LangChain only consults the cache on the invoke path.
+    """
+    if model.cache is False:
+        return None, None, None
+    llm_cache = model.cache if isinstance(model.cache, BaseCache) else get_llm_cache()
+    if llm_cache is None:
+        return None, None, None
+    prompt = dumps([message.model_copy(update={"id": None}) if message.id is not None else message for message in messages])
+    return llm_cache, prompt, model._get_llm_string()
+
+
+def lookup_message(model, messages) -> AIMessage | None:
+    llm_cache, prompt, llm_string = _cache_entry(model, messages)
+    if llm_cache is None:
+        return None
+    generations = llm_cache.lookup(prompt, llm_string)
+    return generations[0].message if generations else None
+
+
+def update_message(model, messages, message: AIMessage) -> None:
+    llm_cache, prompt, llm_string = _cache_entry(model, messages)
+    if llm_cache is not None:
+        llm_cache.update(prompt, llm_string, [ChatGeneration(message=message)])
+
+
+def enable_llm_cache(path: str | None = None) -> TieredLLMCache | None:
+    """
+    Installs the shared cache as LangChain's global LLM cache (once per process), so a repeated prompt is answered
+    from it instead of a new endpoint round trip. Set LLM_CACHE=off to disable it, e.g. when sampling several
+    different answers for the same prompt is the point.
+    """
+    if os.getenv("LLM_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+
+    current = get_llm_cache()
+    if isinstance(current, TieredLLMCache):
+        return current
+
+    cache = TieredLLMCache(
+        path=path or os.getenv("LLM_CACHE_PATH", DEFAULT_LLM_CACHE_PATH),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)),
+    )
+    set_llm_cache(cache)
+    return cache
@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+from typing import Any, Callable
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import Field, PrivateAttr
+
+"""
+One place that builds the chat models for all the workflows.
+
+Every script used to build its own `HuggingFaceEndpoint` + `ChatHuggingFace` at import time: importing
+langchain_huggingface and huggingface_hub's inference clients costs about a second, each endpoint resolves the token
+and sets up its own clients, and a Streamlit page could not even render before that finished. `get_chat_model()`
+returns a lightweight `LazyChatModel` instead, cached by (repo_id, params), so identical models are one object. The
+real client is only built on the first call, and all of them go through a single tuned keep-alive connection pool.
+
+The client comes from a backend registry, so every workflow and chatbot can run on another inference engine without
+changes. MODEL_BACKEND (or `get_chat_model(..., backend=...)`) picks one of:
+
+    huggingface   the remote HF inference endpoints (default)
+    local         any local server speaking the OpenAI chat completions API, e.g. a quantized model on the CPU with
+                  llama.cpp (`llama-server -m qwen2.5-1.5b-instruct-q4_k_m.gguf --port 8080 --parallel 4`), Ollama,
+                  vLLM or a stub; every model of the workflows is served by that one model
+
+`register_backend` adds more, a backend is a function (repo_id, params) -> chat model.
+
+Settings:
+    MODEL_BACKEND              backend used when none is passed (huggingface)
+    LOCAL_MODEL_URL            base URL of the local server (http://127.0.0.1:8080)
+    LOCAL_MODEL_NAME           model name sent to the local server, needed by Ollama / vLLM (default: the repo_id)
+    LOCAL_MODEL_API_KEY        bearer token for the local server, if it wants one
+    HF_REPO_ID                 default model (meta-llama/Llama-3.1-8B-Instruct)
+    HF_ENDPOINT_URL            dedicated / self-hosted endpoint for the default model instead of the HF router
+    HF_ENDPOINT_URLS           the same for any model, as JSON: {"Qwen/Qwen3-32B": "https://..."}
+    HF_POOL_CONNECTIONS        max connections of the shared pool (64)
+    HF_POOL_KEEPALIVE          idle connections kept open for reuse (32)
+    HF_POOL_KEEPALIVE_EXPIRY   seconds an idle connection is kept (90)
+
+The settings are read on first use, so a .env loaded by the script after importing this module still applies.
+"""
+
+DEFAULT_REPO_ID = "meta-llama/Llama-3.1-8B-Instruct"
+
+_lock = threading.Lock()
+_models: dict[tuple, "LazyChatModel"] = {}
+_pool_configured = False
+_backends: dict[str, Callable[[str, dict], BaseChatModel]] = {}
+
+
+def configure_http_pool() -> None:
+    """Makes huggingface_hub create its shared HTTP clients with our pool limits (once per process)."""
+    global _pool_configured
+    with _lock:
+        if _pool_configured:
+            return
+        import httpx
+        from huggingface_hub import get_async_session, get_session, set_async_client_factory, set_client_factory
+
+        #The hub's own hooks add the user agent / request ids and handle its redirects, they are copied from its
+        #default clients onto ours (set_client_factory closes the default shared client again)
+        hooks = {name: list(hook_list) for name, hook_list in get_session().event_hooks.items()}
+        async_hooks = {name: list(hook_list) for name, hook_list in get_async_session().event_hooks.items()}
+
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("HF_POOL_CONNECTIONS", 64)),
+            max_keepalive_connections=int(os.getenv("HF_POOL_KEEPALIVE", 32)),
+            keepalive_expiry=float(os.getenv("HF_POOL_KEEPALIVE_EXPIRY", 90)),
+        )
+        #No read timeout, generations can take long; a dead host should still fail fast
+        timeout = httpx.Timeout(None, connect=10.0)
+
+        set_client_factory(lambda: httpx.Client(
+            limits=limits, timeout=timeout, follow_redirects=True, event_hooks=hooks,
+        ))
+        set_async_client_factory(lambda: httpx.AsyncClient(
+            limits=limits, timeout=timeout, follow_redirects=True, event_hooks=async_hooks,
+        ))
+        _pool_configured = True
+
+
+def register_backend(name: str):
+    """Decorator that registers `factory(repo_id, params)` as the model backend `name`."""
+    def decorator(factory: Callable[[str, dict], BaseChatModel]):
+        _backends[name] = factory
+        return factory
+    return decorator
+
+
+def available_backends() -> list[str]:
+    return sorted(_backends)
+
+
+def endpoint_url_for(repo_id: str) -> str | None:
+    """The dedicated endpoint configured for `repo_id`, None when it goes through the HF router."""
+    endpoint_urls = json.loads(os.getenv("HF_ENDPOINT_URLS") or "{}")
+    if repo_id in endpoint_urls:
+        return endpoint_urls[repo_id]
+    if repo_id == os.getenv("HF_REPO_ID", DEFAULT_REPO_ID):
+        return os.getenv("HF_ENDPOINT_URL")
+    return None
+
+
+@register_backend("huggingface")
+def huggingface_backend(repo_id: str, params: dict) -> BaseChatModel:
+    configure_http_pool()
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+    endpoint_url = endpoint_url_for(repo_id)
+    endpoint = {'endpoint_url': endpoint_url} if endpoint_url else {'repo_id': repo_id}
+    llm = HuggingFaceEndpoint(**endpoint, task="text-generation", **params)
+    return ChatHuggingFace(llm=llm, model_id=repo_id)
+
+
+@register_backend("local")
+def local_backend(repo_id: str, params: dict) -> BaseChatModel:
+    #huggingface_hub's client speaks the OpenAI chat completions API (streaming and tools included) to any base URL,
+    #so the local server shares the pooled clients and the message conversion with the remote backend
+    configure_http_pool()
+    from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
+
+    llm = HuggingFaceEndpoint(
+        endpoint_url=os.getenv("LOCAL_MODEL_URL", "http://127.0.0.1:8080"),
+        huggingfacehub_api_token=os.getenv("LOCAL_MODEL_API_KEY", "local"),
+        task="text-generation",
+        **params,
+    )
+    return ChatHuggingFace(llm=llm, model_id=os.getenv("LOCAL_MODEL_NAME") or repo_id)
+
+
+class LazyChatModel(BaseChatModel):
+    """
+    Chat model that builds its backend's client (e.g. `ChatHuggingFace`) on first use and delegates every call to it.
+    It is a regular chat model itself, so callbacks, streaming, the LLM cache and LangGraph's message streaming all
+    work unchanged.
+    """
+
+    repo_id: str
+    params: dict = Field(default_factory=dict)
+    backend: str = "huggingface"
+    _client: Any = PrivateAttr(default=None)
+    _client_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = _backends[self.backend](self.repo_id, self.params)
+        return self._client
+
+    @property
+    def _llm_type(self) -> str:
+        return "huggingface-chat-wrapper"
+
+    @property
+    def _identifying_params(self) -> dict:
+        #The backend is part of the LLM cache key, a local model's answers are not served for the remote one
+        return {'backend': self.backend, 'repo_id': self.repo_id, **self.params}
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        #Same formatting as ChatHuggingFace.bind_tools, without building the client just to bind
+        if tool_choice:
+            if isinstance(tool_choice, str) and tool_choice not in ("auto", "none", "required"):
+                tool_choice = {"type": "function", "function": {"name": tool_choice}}
+            kwargs['tool_choice'] = tool_choice
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.client._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await self.client._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield from self.client._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async for chunk in self.client._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+
+def get_chat_model(repo_id: str | None = None, backend: str | None = None, **params) -> LazyChatModel:
+    """
+    Returns the shared chat model for `repo_id` (default: HF_REPO_ID) and endpoint `params` (e.g. temperature,
+    max_new_tokens) on `backend` (default: MODEL_BACKEND). Nothing is imported or connected until the model is first
+    invoked.
+    """
+    repo_id = repo_id or os.getenv("HF_REPO_ID", DEFAULT_REPO_ID)
+    backend = backend or os.getenv("MODEL_BACKEND", "huggingface")
+    if backend not in _backends:
+        raise ValueError(f"Unknown model backend {backend!r}, available: {', '.join(available_backends())}")
+
+    key = (backend, repo_id, json.dumps(params, sort_keys=True, default=str))
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = LazyChatModel(repo_id=repo_id, params=params, backend=backend)
+        return model
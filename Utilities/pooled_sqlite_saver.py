@@ -0,0 +1,210 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from langgraph.checkpoint.sqlite import SqliteSaver
+from Utilities.thread_registry import ReaderPool, RegisteredSqliteSaver
+
+"""
+SQLite checkpointer for many concurrent chat sessions.
+
+The plain SqliteSaver shares one connection and one lock between every session, so a slow `get_state` of one user
+holds up the checkpoint writes of all the others. `PooledSqliteSaver` keeps the same interface (and the thread registry
+of RegisteredSqliteSaver) but splits the work:
+
+- reads (get_tuple, list, get_state and the thread registry queries) run on a pool of read-only connections; with WAL
+  they never wait for writers
+- checkpoint and pending-write inserts are handed to a single writer thread, which commits everything that queued up
+  while it was busy in one transaction (group commit) and then wakes the callers
+
+`put` / `put_writes` still return only after their rows are committed, so the durability is the same as SqliteSaver.
+"""
+
+
+class _StatementRecorder:
+    """Stands in for the cursor inside SqliteSaver.put / put_writes and only records what they would execute."""
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params, False))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.statements.append((sql, list(seq_of_params), True))
+        return self
+
+
+class PooledSqliteSaver(RegisteredSqliteSaver):
+    def __init__(self, path: str, readers: int = 4, max_batch: int = 128, write_timeout: float = 60.0, **kwargs):
+        self._local = threading.local()
+        self._readers = ReaderPool(path, readers)
+        self.max_batch = max_batch
+        self.write_timeout = write_timeout
+        self._closed = False
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.batched_writes = 0
+
+        writer = sqlite3.connect(path, check_same_thread=False)
+        writer.execute("PRAGMA synchronous = NORMAL")
+        writer.execute("PRAGMA busy_timeout = 5000")
+        super().__init__(conn=writer, **kwargs)
+        #The registry tables exist now, the sidebar's list_threads / get_thread no longer queue behind the writer lock
+        self.registry.reader = self._readers.connection
+
+        self._writer = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+        self._writer.start()
+
+    #SqliteSaver reads `self.conn` directly in a few places (e.g. the pending writes in `list`), inside a read cursor
+    #that has to be the same pooled reader connection instead of the writer's
+    @property
+    def conn(self) -> sqlite3.Connection:
+        reader = getattr(self._local, "reader", None)
+        return reader if reader is not None else self._writer_conn
+
+    @conn.setter
+    def conn(self, value: sqlite3.Connection) -> None:
+        self._writer_conn = value
+
+    @contextmanager
+    def cursor(self, transaction: bool = True):
+        recorder = getattr(self._local, "recorder", None)
+        if recorder is not None:
+            yield recorder
+            return
+
+        if transaction:
+            #Direct writes that also read (delete_thread, checkpoint compaction) keep SqliteSaver's locked cursor
+            with self.lock:
+                cur = self._writer_conn.cursor()
+                try:
+                    yield cur
+                finally:
+                    self._writer_conn.commit()
+                    cur.close()
+            return
+
+        #Never blocks on the pool, a short-lived extra reader is opened when every pooled one is busy (or held by an
+        #unfinished `list` generator)
+        with self._readers.connection() as reader:
+            previous = getattr(self._local, "reader", None)
+            self._local.reader = reader
+            cur = reader.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+                self._local.reader = previous
+
+    @contextmanager
+    def _recording(self):
+        recorder = self._local.recorder = _StatementRecorder()
+        try:
+            yield recorder.statements
+        finally:
+            self._local.recorder = None
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._recording() as statements:
+            next_config = SqliteSaver.put(self, config, checkpoint, metadata, new_versions)
+        if not config["configurable"].get("checkpoint_ns"):
+            sql, params = self.registry.write_statement(config["configurable"]["thread_id"], checkpoint)
+            statements.append((sql, params, False))
+        self._submit(statements)
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._recording() as statements:
+            SqliteSaver.put_writes(self, config, writes, task_id, task_path)
+        self._submit(statements)
+
+    def _submit(self, statements: list) -> None:
+        if self._closed or not self._writer.is_alive():
+            raise RuntimeError("The checkpoint writer is stopped, the saver was closed.")
+        future = Future()
+        self._queue.put((statements, future))
+
+        #A write queued just as close() stopped the writer is never picked up, so the wait is checked in short steps
+        deadline = time.monotonic() + self.write_timeout
+        while True:
+            try:
+                return future.result(timeout=min(1.0, max(0.0, deadline - time.monotonic())))
+            except TimeoutError:
+                if future.done():
+                    continue
+                if not self._writer.is_alive():
+                    raise RuntimeError("The checkpoint writer stopped before this write was committed.") from None
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"The checkpoint write was not committed within {self.write_timeout} seconds.") from None
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            #Whatever queued up during the previous commit goes into this one, no extra waiting at low load
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: list) -> None:
+        conn = self._writer_conn
+        with self.lock:
+            try:
+                for statements, _ in batch:
+                    self._execute(conn, statements)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                #Replay one by one so a single bad write does not fail everyone else in the batch
+                for statements, future in batch:
+                    try:
+                        self._execute(conn, statements)
+                        conn.commit()
+                    except Exception as error:
+                        conn.rollback()
+                        future.set_exception(error)
+                    else:
+                        future.set_result(None)
+                return
+            self.batches += 1
+            self.batched_writes += len(batch)
+
+        for _, future in batch:
+            future.set_result(None)
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, statements: list) -> None:
+        for sql, params, many in statements:
+            if many:
+                conn.executemany(sql, params)
+            else:
+                conn.execute(sql, params)
+
+    def close(self) -> None:
+        """Stops the writer after the queued writes are committed and closes every connection."""
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        #Writes queued behind the stop marker are failed instead of left waiting
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("The checkpoint writer is stopped, the saver was closed."))
+        self._readers.close()
+        self._writer_conn.close()
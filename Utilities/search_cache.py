@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from langchain_core.tools import BaseTool, StructuredTool
+from Utilities.sqlite_ttl_store import SqliteTTLStore
+
+"""
+Persistent cache for the search tools of the tools chatbot (DuckDuckGo, Wikipedia).
+
+The model tends to repeat a query in a later turn, and many users ask the same popular questions, yet every call went
+to the network. `cached_tool` wraps a tool so its results are kept in an SQLite store with a TTL and a size bound
+(SqliteTTLStore, as for the LLM cache), keyed by the tool name and the normalized query. Identical queries that arrive
+while the first one is still running wait for it instead of starting their own request (single flight).
+
+`SearchCache.stats()` reports hits, misses, the calls that joined an in-flight request, the hit rate and the seconds of
+tool latency saved (the latency of every request that was not sent).
+
+Settings, read by `get_search_cache()` after the backends' load_dotenv():
+    SEARCH_CACHE                off disables the cache
+    SEARCH_CACHE_PATH           SQLite file (<repo>/.cache/search_cache.db)
+    SEARCH_CACHE_TTL_SECONDS    lifetime of an entry (one day)
+    SEARCH_CACHE_MAX_ENTRIES    entries kept in the store (5000)
+    SEARCH_CACHE_WAIT_SECONDS   how long a call waits for an identical in-flight one (30)
+"""
+
+DEFAULT_SEARCH_CACHE_PATH = str(Path(__file__).resolve().parents[1] / ".cache" / "search_cache.db")
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5_000
+DEFAULT_WAIT_SECONDS = 30.0
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def normalize_query(query: str) -> str:
+    #"Who is  Harry Potter?" and "who is harry potter" should share one entry
+    query = re.sub(r"\s+", " ", str(query)).strip().casefold()
+    return query.strip(" \"'?!.")
+
+
+def search_key(namespace: str, arguments: dict) -> str:
+    arguments = {name: normalize_query(value) if isinstance(value, str) else value for name, value in arguments.items()}
+    payload = json.dumps(arguments, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{namespace}\x00{payload}".encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_SEARCH_CACHE_PATH,
+        ttl_seconds: float | None = DEFAULT_TTL_SECONDS,
+        max_entries: int | None = DEFAULT_MAX_ENTRIES,
+        wait_seconds: float | None = DEFAULT_WAIT_SECONDS,
+    ):
+        """`wait_seconds` is the timeout `cached_tool` passes to `get_or_compute`."""
+        self.store = SqliteTTLStore(path, table="search_cache", ttl_seconds=ttl_seconds, max_entries=max_entries)
+        self.wait_seconds = wait_seconds
+        self.lock = threading.Lock()
+        self.in_flight: dict[str, Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.saved_seconds = 0.0
+
+    def _cached(self, key: str):
+        value = self.store.get(key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        with self.lock:
+            self.hits += 1
+            self.saved_seconds += entry['latency']
+        return entry
+
+    def get_or_compute(self, namespace: str, arguments: dict, compute, timeout: float | None = None):
+        """
+        The cached result for `arguments`, or `compute()`'s. A call that joins an identical in-flight one waits at most
+        what is left of `timeout` seconds for it and then raises TimeoutError.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        key = search_key(namespace, arguments)
+        if (entry := self._cached(key)) is not None:
+            return entry['result']
+
+        with self.lock:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self.in_flight[key] = Future()
+
+        if not leader:
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            result, latency = future.result(remaining)
+            with self.lock:
+                self.coalesced += 1
+                self.saved_seconds += latency
+            return result
+
+        start = time.perf_counter()
+        try:
+            #A leader that finished between the first lookup and the lock stored its result before leaving in_flight
+            if (entry := self._cached(key)) is not None:
+                future.set_result((entry['result'], entry['latency']))
+                return entry['result']
+            result = compute()
+        except BaseException as error:
+            #Failures are not cached, whoever waited on this call gets the same error
+            future.set_exception(error)
+            raise
+        else:
+            latency = time.perf_counter() - start
+            self.store.set(key, json.dumps({'result': result, 'latency': latency}, default=str))
+            future.set_result((result, latency))
+            with self.lock:
+                self.misses += 1
+            return result
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def clear(self) -> None:
+        self.store.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses + self.coalesced
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced,
+                    'hit_rate': (self.hits + self.coalesced) / total if total else 0.0,
+                    'saved_seconds': round(self.saved_seconds, 3)}
+
+
+def get_search_cache() -> SearchCache | None:
+    """The process-wide cache, None with SEARCH_CACHE=off."""
+    global _default_cache
+    if os.getenv("SEARCH_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SearchCache(
+                path=os.getenv("SEARCH_CACHE_PATH", DEFAULT_SEARCH_CACHE_PATH),
+                ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+                max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                wait_seconds=float(os.getenv("SEARCH_CACHE_WAIT_SECONDS", DEFAULT_WAIT_SECONDS)),
+            )
+    return _default_cache
+
+
+def cached_tool(tool: BaseTool, cache: SearchCache | None = None) -> BaseTool:
+    """Same name, description and arguments as `tool`, with its results served from the search cache."""
+    cache = cache or get_search_cache()
+    if cache is None:
+        return tool
+
+    def run(**arguments):
+        return cache.get_or_compute(tool.name, arguments, lambda: tool.invoke(arguments), timeout=cache.wait_seconds)
+
+    #The async path of StructuredTool runs `run` in an executor thread, so both share the single-flight bookkeeping
+    return StructuredTool.from_function(func=run, name=tool.name, description=tool.description,
+                                        args_schema=tool.args_schema)
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+"""
+Small persistent key/value store on SQLite with a TTL per entry and LRU-style eviction once `max_entries` is exceeded.
+Shared by the LLM response cache and the search tool cache.
+"""
+
+
+class SqliteTTLStore:
+    def __init__(self, path: str, table: str = "entries", ttl_seconds: float | None = None, max_entries: int | None = None):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        with self.lock:
+            self.conn.executescript(
+                f"""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=NORMAL;
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at);
+                """
+            )
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.conn.commit()
+                return None
+            self.conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return value
+
+    def set(self, key: str, value: str, ttl_seconds: float | None = None) -> None:
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = now + ttl_seconds if ttl_seconds else None
+        with self.lock:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, expires_at, now),
+            )
+            self.conn.commit()
+            self._writes_since_eviction += 1
+            #Checking the table size on every write would cost a COUNT per call, evict in small rounds instead
+            if self.max_entries and self._writes_since_eviction >= max(1, self.max_entries // 100):
+                self._evict()
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.conn.commit()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.conn.execute(f"DELETE FROM {self.table}")
+            self.conn.commit()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _evict(self) -> None:
+        self._writes_since_eviction = 0
+        self.conn.execute(f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self.conn.commit()
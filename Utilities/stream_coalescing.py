@@ -0,0 +1,60 @@
+import os
+import time
+from typing import Callable, Iterable, Iterator
+
+"""
+Groups streamed tokens into fewer UI updates.
+
+`st.write_stream` re-renders the whole response so far for every chunk it receives, so a reply of a few hundred tokens
+means a few hundred websocket messages, each carrying all the text before it. `coalesce_chunks` sits between the model
+stream and `st.write_stream` and only yields once per frame budget: when `max_delay` seconds have passed since the
+last update or `max_chars` characters are buffered. The first token is always yielded right away, so the
+time-to-first-token the user sees stays the same, and whatever is left is yielded when the stream ends.
+
+The adapter pulls from the source like any generator, so a buffer is only flushed when the next chunk arrives (or the
+stream ends); during a pause in the stream the last few characters wait with it.
+
+Budgets can be tuned with STREAM_FLUSH_MS (50) and STREAM_FLUSH_CHARS (64), read on every call so a .env loaded after
+the import applies.
+"""
+
+
+def coalesce_chunks(
+    chunks: Iterable,
+    max_delay: float | None = None,
+    max_chars: int | None = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Iterator:
+    """
+    Yields the strings of `chunks` joined into batches of at most one per `max_delay` seconds (or `max_chars`
+    characters). Empty strings are dropped and anything that is not a string is passed through after flushing the buffer,
+    like `st.write_stream` does with them.
+    """
+    if max_delay is None:
+        max_delay = float(os.getenv("STREAM_FLUSH_MS", "50")) / 1000
+    if max_chars is None:
+        max_chars = int(os.getenv("STREAM_FLUSH_CHARS", "64"))
+    buffer = []
+    buffered = 0
+    last_flush = None
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            if buffer:
+                yield "".join(buffer)
+                buffer, buffered = [], 0
+                last_flush = clock()
+            yield chunk
+            continue
+        if not chunk:
+            continue
+
+        buffer.append(chunk)
+        buffered += len(chunk)
+        now = clock()
+        if last_flush is None or buffered >= max_chars or now - last_flush >= max_delay:
+            yield "".join(buffer)
+            buffer, buffered = [], 0
+            last_flush = now
+
+    if buffer:
+        yield "".join(buffer)
@@ -0,0 +1,270 @@
+import json
+import typing
+from contextlib import aclosing, closing
+from typing import Annotated, Literal
+from langchain_core.callbacks.manager import adispatch_custom_event, dispatch_custom_event
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage, convert_to_messages
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from Utilities.llm_cache import lookup_message, update_message
+
+"""
+Structured output parsed while the model is still streaming.
+
+`chain = template | model | PydanticOutputParser` waits for the whole generation before looking at it. The models here
+often keep talking after the JSON object (explanations, a second "corrected" object, closing remarks), and a wrong value
+such as `"evaluation": "maybe"` is only noticed once every token is paid for. `IncrementalObjectParser` scans the stream
+as it arrives: every field is validated against the pydantic model as soon as its value is complete, Literal fields are
+prefix-checked while they are being written, so an invalid generation is cut short. Once the top level object is done
+the stream is closed as well, so the trailing text is never generated. A closed stream ends the model run through
+`on_llm_error`, callbacks see such a run as aborted with the text generated so far.
+A `{` in prose before the object (`use {name} as a placeholder`) is skipped once it turns out not to start a JSON object.
+`invoke_structured` wraps this with the shared LLM cache and a few retries for generations that fail validation.
+Every failed generation is reported as a `PARSER_FAILURE_EVENT` custom callback event.
+"""
+
+PARSER_FAILURE_EVENT = "parser_failure"
+
+
+def _literal_options(annotation) -> tuple | None:
+    if typing.get_origin(annotation) is Literal:
+        options = typing.get_args(annotation)
+        if all(isinstance(option, str) for option in options):
+            return options
+    return None
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in content)
+
+
+class IncrementalObjectParser:
+    """
+    Feed it the streamed text with `feed()`; it returns the validated object once the first top level JSON object is
+    complete and raises OutputParserException as soon as a finished field (or a Literal prefix) cannot be valid.
+    """
+
+    def __init__(self, pydantic_object: type[BaseModel]):
+        self.pydantic_object = pydantic_object
+        self.validators = {
+            name: TypeAdapter(Annotated[(field.annotation, *field.metadata)]) if field.metadata else TypeAdapter(field.annotation)
+            for name, field in pydantic_object.model_fields.items()
+        }
+        self.literal_fields = {
+            name: options
+            for name, field in pydantic_object.model_fields.items()
+            if (options := _literal_options(field.annotation)) is not None
+        }
+        self.buffer = ""
+        self.result = None
+        self._start = None
+        self._position = 0
+        #Closing brackets expected for the brackets opened so far
+        self._closers = []
+        self._in_string = False
+        self._escape = False
+        self._checked = set()
+
+    @property
+    def object_text(self) -> str | None:
+        """The JSON object without any text around it, once it is complete."""
+        if self.result is None:
+            return None
+        return self.buffer[self._start:self._position]
+
+    def feed(self, text: str) -> BaseModel | None:
+        if self.result is not None:
+            return self.result
+        self.buffer += text
+
+        if self._start is None and not self._restart(self._position):
+            return None
+
+        buffer = self.buffer
+        while self._position < len(buffer):
+            char = buffer[self._position]
+            self._position += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._closers.append("}" if char == "{" else "]")
+            elif char in "}]":
+                if self._closers.pop() != char:
+                    #Mismatched brackets, this candidate is not JSON
+                    if not self._restart(self._start + 1):
+                        return None
+                    continue
+                if not self._closers:
+                    text = buffer[self._start:self._position]
+                    if self._load(text) is None:
+                        if not self._restart(self._start + 1):
+                            return None
+                        continue
+                    self.result = self._validate_object(text)
+                    return self.result
+            elif char == "," and len(self._closers) == 1:
+                #Every field before this comma is complete, close the object to validate them
+                data = self._load(buffer[self._start:self._position - 1] + "}")
+                if data is None:
+                    if not self._restart(self._start + 1):
+                        return None
+                    continue
+                self._check_fields(data)
+
+        if self._in_string and self.literal_fields:
+            self._check_literal_prefix()
+        return None
+
+    def finish(self) -> BaseModel:
+        """Called when the stream ended, raises if no complete object was produced."""
+        if self.result is None:
+            raise OutputParserException(
+                f"The output ended before a complete {self.pydantic_object.__name__} object.", llm_output=self.buffer
+            )
+        return self.result
+
+    def _restart(self, position: int) -> bool:
+        """Makes the next `{` at or after `position` the candidate object, False while there is none."""
+        start = self.buffer.find("{", position)
+        self._closers = []
+        self._in_string = self._escape = False
+        self._checked = set()
+        if start == -1:
+            self._start, self._position = None, len(self.buffer)
+            return False
+        self._start = self._position = start
+        return True
+
+    @staticmethod
+    def _load(text: str) -> dict | None:
+        #None means the candidate `{` was prose rather than the start of the object
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _check_fields(self, data: dict) -> None:
+        for name, value in data.items():
+            if name in self._checked or name not in self.validators:
+                continue
+            try:
+                self.validators[name].validate_python(value)
+            except ValidationError as error:
+                raise OutputParserException(f"Invalid value for '{name}': {error}", llm_output=self.buffer) from error
+            self._checked.add(name)
+
+    def _check_literal_prefix(self) -> None:
+        partial = parse_partial_json(self.buffer[self._start:])
+        if not isinstance(partial, dict) or not partial:
+            return
+        #parse_partial_json keeps the key order, so the last key is the one currently being written
+        name, value = list(partial.items())[-1]
+        options = self.literal_fields.get(name)
+        if options and isinstance(value, str) and not any(option.startswith(value) for option in options):
+            raise OutputParserException(
+                f"Invalid value for '{name}': '{value}...' is none of {list(options)}", llm_output=self.buffer
+            )
+
+    def _validate_object(self, text: str) -> BaseModel:
+        try:
+            return self.pydantic_object.model_validate_json(text)
+        except ValidationError as error:
+            raise OutputParserException(f"Invalid {self.pydantic_object.__name__}: {error}", llm_output=self.buffer) from error
+
+
+def _from_cache(model, messages, pydantic_object):
+    cached = lookup_message(model, messages)
+    if cached is None:
+        return None
+    parser = IncrementalObjectParser(pydantic_object)
+    try:
+        parser.feed(_content_text(cached.content))
+        return parser.finish()
+    except OutputParserException:
+        #An entry written by a plain `invoke` that does not parse, ask the model again
+        return None
+
+
+def _failure_event(error: OutputParserException, attempt: int) -> dict:
+    return {'error': str(error)[:200], 'attempt': attempt}
+
+
+def _report_failure(error: OutputParserException, attempt: int) -> None:
+    try:
+        dispatch_custom_event(PARSER_FAILURE_EVENT, _failure_event(error, attempt))
+    except RuntimeError:
+        #Called outside of any run (no parent run id), nobody to report to
+        pass
+
+
+async def _areport_failure(error: OutputParserException, attempt: int) -> None:
+    try:
+        await adispatch_custom_event(PARSER_FAILURE_EVENT, _failure_event(error, attempt))
+    except RuntimeError:
+        pass
+
+
+def invoke_structured(model, prompt, pydantic_object: type[BaseModel], max_retries: int = 2) -> BaseModel:
+    """
+    Streams `model` on `prompt` (a PromptValue or a list of messages) and returns the parsed `pydantic_object`.
+    The stream is closed as soon as the object is complete; an invalid generation is aborted early and retried up to
+    `max_retries` times before the last OutputParserException is raised.
+    """
+    messages = prompt.to_messages() if hasattr(prompt, "to_messages") else convert_to_messages(prompt)
+    if (result := _from_cache(model, messages, pydantic_object)) is not None:
+        return result
+
+    for attempt in range(max_retries + 1):
+        parser = IncrementalObjectParser(pydantic_object)
+        try:
+            with closing(model.stream(messages)) as chunks:
+                for chunk in chunks:
+                    #Stop reading once the object is complete, closing the stream cancels the rest of the generation
+                    if parser.feed(_content_text(chunk.content)) is not None:
+                        break
+            result = parser.finish()
+        except OutputParserException as error:
+            _report_failure(error, attempt)
+            if attempt == max_retries:
+                raise
+            continue
+
+        #Only the object goes into the cache, a later invoke of the same prompt parses it without the trailing chatter
+        update_message(model, messages, AIMessage(content=parser.object_text))
+        return result
+
+
+async def ainvoke_structured(model, prompt, pydantic_object: type[BaseModel], max_retries: int = 2) -> BaseModel:
+    """Async version of `invoke_structured`."""
+    messages = prompt.to_messages() if hasattr(prompt, "to_messages") else convert_to_messages(prompt)
+    if (result := _from_cache(model, messages, pydantic_object)) is not None:
+        return result
+
+    for attempt in range(max_retries + 1):
+        parser = IncrementalObjectParser(pydantic_object)
+        try:
+            async with aclosing(model.astream(messages)) as chunks:
+                async for chunk in chunks:
+                    if parser.feed(_content_text(chunk.content)) is not None:
+                        break
+            result = parser.finish()
+        except OutputParserException as error:
+            await _areport_failure(error, attempt)
+            if attempt == max_retries:
+                raise
+            continue
+
+        update_message(model, messages, AIMessage(content=parser.object_text))
+        return result
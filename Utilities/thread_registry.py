@@ -0,0 +1,329 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+import aiosqlite
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+"""
+Thread registry for the SQLite backed chatbots.
+
+Instead of walking every checkpoint in chatbot.db to find the distinct thread_ids, we keep one row per thread in a small
+indexed table that is updated on every checkpoint write. Existing databases are backfilled once on first start.
+
+All the DB chatbots share one database, <repo>/chatbot.db unless CHATBOT_DB_PATH points elsewhere, whatever directory
+they are started from.
+"""
+
+TITLE_LENGTH = 60
+DEFAULT_CHATBOT_DB_PATH = str(Path(__file__).resolve().parents[1] / "chatbot.db")
+
+
+def chatbot_db_path() -> str:
+    return os.getenv("CHATBOT_DB_PATH", DEFAULT_CHATBOT_DB_PATH)
+
+
+@dataclass(frozen=True)
+class ThreadRecord:
+    thread_id: str
+    title: str | None
+    created_at: str
+    updated_at: str
+
+
+def title_from_messages(messages, length: int = TITLE_LENGTH) -> str | None:
+    """Uses the first human message of the conversation as the thread title."""
+    for message in messages or []:
+        if isinstance(message, HumanMessage) and isinstance(message.content, str):
+            title = " ".join(message.content.split())
+            return title[:length] if title else None
+    return None
+
+
+class ReaderPool:
+    """Read-only connections to one database, lent out one at a time and reused; never blocks on an empty pool."""
+
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._connect())
+
+    def _connect(self) -> sqlite3.Connection:
+        reader = sqlite3.connect(self.path, check_same_thread=False)
+        reader.execute("PRAGMA query_only = ON")
+        reader.execute("PRAGMA busy_timeout = 5000")
+        return reader
+
+    @contextmanager
+    def connection(self):
+        try:
+            reader, pooled = self._idle.get_nowait(), True
+        except queue.Empty:
+            #Every pooled reader is busy (or held by an unfinished generator), a short-lived extra one is cheaper than waiting
+            reader, pooled = self._connect(), False
+        try:
+            yield reader
+        finally:
+            if pooled:
+                self._idle.put(reader)
+            else:
+                reader.close()
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class ThreadRegistry:
+    """
+    Keeps the `thread_registry` table of a checkpoint database. The connection and lock are shared with the
+    checkpointer so registry writes never interleave with a checkpoint transaction. With a `reader` (e.g.
+    `ReaderPool.connection`) the reads use its connections instead and do not wait for the writes.
+    """
+
+    def __init__(self, conn: sqlite3.Connection | None, lock=None, reader=None):
+        self.conn = conn
+        self.lock = lock or threading.Lock()
+        self.reader = reader
+        self.is_setup = False
+
+    @contextmanager
+    def _read(self):
+        if self.reader is not None:
+            #The tables are created by the writer before any reader is handed out
+            with self.reader() as conn:
+                yield conn
+            return
+        with self.lock:
+            self.setup()
+            yield self.conn
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS thread_registry (
+                thread_id TEXT PRIMARY KEY,
+                title TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS thread_registry_updated_at ON thread_registry (updated_at, thread_id);
+            CREATE TABLE IF NOT EXISTS thread_registry_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            """
+        )
+        self.is_setup = True
+
+    def write_statement(self, thread_id, checkpoint) -> tuple[str, tuple]:
+        """SQL and parameters of the upsert for a freshly written checkpoint. The title is only set once."""
+        title = title_from_messages(checkpoint["channel_values"].get("messages"))
+        return (
+            """
+            INSERT INTO thread_registry (thread_id, title, created_at, updated_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(thread_id) DO UPDATE SET
+                updated_at = MAX(thread_registry.updated_at, excluded.updated_at),
+                title = COALESCE(thread_registry.title, excluded.title)
+            """,
+            (str(thread_id), title, checkpoint["ts"], checkpoint["ts"]),
+        )
+
+    @staticmethod
+    def remove_statement(thread_id) -> tuple[str, tuple]:
+        return "DELETE FROM thread_registry WHERE thread_id = ?", (str(thread_id),)
+
+    def record_write(self, thread_id, checkpoint) -> None:
+        """Upserts the thread row for a freshly written checkpoint."""
+        sql, params = self.write_statement(thread_id, checkpoint)
+        with self.lock:
+            self.setup()
+            self.conn.execute(sql, params)
+            self.conn.commit()
+
+    def list_threads(self, limit: int | None = 50, before: ThreadRecord | None = None) -> list[ThreadRecord]:
+        """
+        Returns threads ordered by most recently updated first. Pass the last record of a page as `before`
+        to fetch the next page (keyset pagination, so deep pages stay as cheap as the first one).
+        """
+        query = "SELECT thread_id, title, created_at, updated_at FROM thread_registry"
+        params = []
+        if before is not None:
+            query += " WHERE (updated_at, thread_id) < (?, ?)"
+            params += [before.updated_at, before.thread_id]
+        query += " ORDER BY updated_at DESC, thread_id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        with self._read() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        return [ThreadRecord(*row) for row in rows]
+
+    def get_thread(self, thread_id) -> ThreadRecord | None:
+        with self._read() as conn:
+            row = conn.execute(
+                "SELECT thread_id, title, created_at, updated_at FROM thread_registry WHERE thread_id = ?",
+                (str(thread_id),),
+            ).fetchone()
+
+        return ThreadRecord(*row) if row else None
+
+    def idle_threads(self, before: str, limit: int = 100) -> list[str]:
+        """Ids of the threads whose last write is older than the ISO timestamp `before`, oldest first."""
+        with self._read() as conn:
+            rows = conn.execute(
+                "SELECT thread_id FROM thread_registry WHERE updated_at < ? ORDER BY updated_at LIMIT ?",
+                (before, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._read() as conn:
+            return conn.execute("SELECT COUNT(*) FROM thread_registry").fetchone()[0]
+
+    def remove_thread(self, thread_id) -> None:
+        with self.lock:
+            self.setup()
+            self.conn.execute(*self.remove_statement(thread_id))
+            self.conn.commit()
+
+    def backfill(self, checkpointer: SqliteSaver, force: bool = False) -> int:
+        """
+        One-time migration for databases that were written before the registry existed. Only the first and the
+        latest root checkpoint of every thread are deserialized, so this costs one pass per thread, not per checkpoint.
+        Returns the number of threads registered.
+        """
+        with self.lock:
+            self.setup()
+            done = self.conn.execute("SELECT value FROM thread_registry_meta WHERE key = 'backfilled_at'").fetchone()
+            if done and not force:
+                return 0
+
+            has_checkpoints = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'checkpoints'"
+            ).fetchone()
+            threads = self.conn.execute(
+                """
+                SELECT thread_id, MIN(checkpoint_id), MAX(checkpoint_id) FROM checkpoints
+                WHERE checkpoint_ns = '' GROUP BY thread_id
+                """
+            ).fetchall() if has_checkpoints else []
+
+            for thread_id, first_id, last_id in threads:
+                first = self._load_checkpoint(checkpointer, thread_id, first_id)
+                last = self._load_checkpoint(checkpointer, thread_id, last_id)
+                self.conn.execute(
+                    """
+                    INSERT INTO thread_registry (thread_id, title, created_at, updated_at) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(thread_id) DO UPDATE SET
+                        created_at = MIN(thread_registry.created_at, excluded.created_at),
+                        updated_at = MAX(thread_registry.updated_at, excluded.updated_at),
+                        title = COALESCE(thread_registry.title, excluded.title)
+                    """,
+                    (
+                        thread_id,
+                        title_from_messages(last["channel_values"].get("messages")),
+                        first["ts"],
+                        last["ts"],
+                    ),
+                )
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO thread_registry_meta (key, value) VALUES ('backfilled_at', datetime('now'))"
+            )
+            self.conn.commit()
+
+        return len(threads)
+
+    def _load_checkpoint(self, checkpointer: SqliteSaver, thread_id: str, checkpoint_id: str):
+        type_, blob = self.conn.execute(
+            "SELECT type, checkpoint FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id = ?",
+            (thread_id, checkpoint_id),
+        ).fetchone()
+        return checkpointer.serde.loads_typed((type_, blob))
+
+
+class RegisteredSqliteSaver(SqliteSaver):
+    """
+    Drop-in SqliteSaver that keeps the thread registry up to date on every root checkpoint write
+    and backfills it the first time it is opened on an existing database.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.registry = ThreadRegistry(conn, lock=self.lock)
+        with self.lock:
+            #Only takes effect on a new database, lets checkpoint compaction return freed pages without a full VACUUM
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self.setup()
+        self.registry.backfill(self)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        #Subgraph checkpoints share the thread_id of their parent, only the root graph decides the thread's timestamps
+        if not config["configurable"].get("checkpoint_ns"):
+            self.registry.record_write(config["configurable"]["thread_id"], checkpoint)
+        return next_config
+
+    def delete_thread(self, thread_id) -> None:
+        super().delete_thread(thread_id)
+        self.registry.remove_thread(thread_id)
+
+
+class RegisteredAsyncSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver that upserts the thread registry row in the same connection right after every root checkpoint, so
+    its connection stays the only writer. The `registry` only serves reads, from read-only connections to the same
+    database (see `open_registered_async_saver`).
+    """
+
+    def __init__(self, conn, registry: ThreadRegistry, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.registry = registry
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await super().aput(config, checkpoint, metadata, new_versions)
+        if not config["configurable"].get("checkpoint_ns"):
+            sql, params = self.registry.write_statement(config["configurable"]["thread_id"], checkpoint)
+            async with self.lock:
+                await self.conn.execute(sql, params)
+                await self.conn.commit()
+        return next_config
+
+    async def adelete_thread(self, thread_id) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute(*self.registry.remove_statement(thread_id))
+            await self.conn.commit()
+
+
+async def open_registered_async_saver(path: str | None = None) -> RegisteredAsyncSqliteSaver:
+    """
+    Opens the checkpoint database at `path` (default: `chatbot_db_path()`) for an async graph, on the running loop.
+    The registry tables and the one-time backfill are done first on a short-lived sync connection, then the aiosqlite
+    connection becomes the single writer and the registry reads go to a ReaderPool.
+    """
+    path = path or chatbot_db_path()
+    with closing(sqlite3.connect(path)) as conn:
+        RegisteredSqliteSaver(conn)
+
+    connection = await aiosqlite.connect(path)
+    #Another process (the sync Streamlit app, a second server worker) may write to the same file
+    await connection.execute("PRAGMA journal_mode = WAL")
+    await connection.execute("PRAGMA busy_timeout = 5000")
+    await connection.execute("PRAGMA synchronous = NORMAL")
+    registry = ThreadRegistry(None, reader=ReaderPool(path).connection)
+    checkpointer = RegisteredAsyncSqliteSaver(connection, registry=registry)
+    await checkpointer.setup()
+    return checkpointer
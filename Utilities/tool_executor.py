@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Callable
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from langchain_core.tools import BaseTool
+
+"""
+Tool step for the tools chatbot that runs every tool call of a turn at the same time, each with its own deadline.
+
+ToolNode gives a slow search or API call all the time it wants, so one hanging request holds up the turn. The node
+built by `timed_tool_node` starts all tool calls of the last AI message together (threads for the sync graph, tasks for
+the async one) and waits for each only as long as its tool's timeout. A call that runs over is cancelled where that is
+possible and answered with a structured timeout message the model can react to, so the turn takes as long as its
+slowest tool, capped by the largest timeout, instead of the sum of all of them.
+
+The sync calls share one pool of TOOL_WORKERS threads across all sessions, and a call that timed out keeps its worker
+until the underlying request gives up. A call's timeout therefore only starts once it has a worker; one that does not
+get a worker within its timeout is answered with a separate `busy` message instead of being reported as a slow tool.
+
+Each ToolMessage carries its own latency and the latency of the whole step in `response_metadata`.
+
+Settings, read when the node is built / the pool is first used:
+    TOOL_TIMEOUT    seconds for tools without their own timeout (10)
+    TOOL_WORKERS    threads of the shared pool for the sync graph (16)
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ContextThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ContextThreadPoolExecutor(max_workers=int(os.getenv("TOOL_WORKERS", "16")),
+                                                  thread_name_prefix="tool-call")
+        return _executor
+
+
+def timeout_message(call: dict, timeout: float) -> ToolMessage:
+    content = json.dumps({'error': 'timeout', 'tool': call['name'], 'timeout_seconds': timeout,
+                          'message': f"The tool did not answer within {timeout:g} seconds, answer without it or try a narrower query."})
+    return ToolMessage(content=content, name=call['name'], tool_call_id=call['id'], status='error')
+
+
+def busy_message(call: dict, waited: float) -> ToolMessage:
+    content = json.dumps({'error': 'busy', 'tool': call['name'], 'waited_seconds': round(waited, 3),
+                          'message': f"The tool could not be started within {waited:g} seconds because all tool workers are busy, answer without it or try again later."})
+    return ToolMessage(content=content, name=call['name'], tool_call_id=call['id'], status='error')
+
+
+def error_message(call: dict, error: Exception) -> ToolMessage:
+    return ToolMessage(content=f"Error: {error!r}\n Please fix your mistakes.", name=call['name'], tool_call_id=call['id'],
+                       status='error')
+
+
+def _with_latency(results: list[tuple[ToolMessage, float, bool]], turn_latency: float) -> dict:
+    messages = []
+    for message, latency, timed_out in results:
+        message.response_metadata = {**message.response_metadata, 'latency': round(latency, 4),
+                                     'turn_latency': round(turn_latency, 4), 'timed_out': timed_out}
+        messages.append(message)
+    return {'messages': messages}
+
+
+class _PendingCall:
+    def __init__(self, call: dict):
+        self.call = call
+        self.started = threading.Event()
+        self.started_at = None
+        self.future = None
+
+
+def timed_tool_node(tools: list[BaseTool], timeouts: dict[str, float] | None = None,
+                    default_timeout: float | None = None, name: str = "tools",
+                    time_left: Callable[[dict, RunnableConfig], float | None] | None = None) -> RunnableLambda:
+    """
+    Drop-in replacement for `ToolNode(tools)` on a `messages` state. `timeouts` maps tool names to seconds, every other
+    tool gets `default_timeout` (TOOL_TIMEOUT). `time_left(state, config)` caps all of them, e.g. by what is left of a
+    turn budget, counted from the start of the step.
+    """
+    tools_by_name = {tool.name: tool for tool in tools}
+    timeouts = timeouts or {}
+    if default_timeout is None:
+        default_timeout = float(os.getenv("TOOL_TIMEOUT", "10"))
+
+    def limits_for(call: dict, state, config: RunnableConfig) -> tuple[float, float | None]:
+        left = time_left(state, config) if time_left else None
+        return timeouts.get(call['name'], default_timeout), None if left is None else max(0.0, left)
+
+    def timeout_for(call: dict, state, config: RunnableConfig) -> float:
+        timeout, left = limits_for(call, state, config)
+        return timeout if left is None else min(timeout, left)
+
+    def tool_calls(state) -> list[dict]:
+        message = next(message for message in reversed(state['messages']) if isinstance(message, AIMessage))
+        return message.tool_calls
+
+    def invalid_tool(call: dict) -> ToolMessage | None:
+        if call['name'] in tools_by_name:
+            return None
+        return ToolMessage(content=f"Error: {call['name']} is not a valid tool, try one of [{', '.join(tools_by_name)}].",
+                           name=call['name'], tool_call_id=call['id'], status='error')
+
+    def invoke_tool(pending: _PendingCall, config: RunnableConfig) -> tuple[ToolMessage, float]:
+        call = pending.call
+        pending.started_at = start = time.perf_counter()
+        pending.started.set()
+        try:
+            message = tools_by_name[call['name']].invoke({**call, 'type': 'tool_call'}, config)
+        except Exception as error:
+            message = error_message(call, error)
+        return message, time.perf_counter() - start
+
+    async def ainvoke_tool(call: dict, config: RunnableConfig) -> ToolMessage:
+        try:
+            return await tools_by_name[call['name']].ainvoke({**call, 'type': 'tool_call'}, config)
+        except Exception as error:
+            return error_message(call, error)
+
+    def run_tools(state, config: RunnableConfig) -> dict:
+        start = time.perf_counter()
+        executor = get_executor()
+        calls = []
+        for call in tool_calls(state):
+            pending = _PendingCall(call)
+            if invalid_tool(call) is None:
+                pending.future = executor.submit(invoke_tool, pending, config)
+            calls.append(pending)
+
+        results = []
+        for pending in calls:
+            call, future = pending.call, pending.future
+            if future is None:
+                results.append((invalid_tool(call), 0.0, False))
+                continue
+            timeout, left = limits_for(call, state, config)
+            #Waiting for a worker is bounded like the call itself, a call that never started is not a tool timeout
+            limit = timeout if left is None else min(timeout, left)
+            if not pending.started.wait(max(0.0, limit - (time.perf_counter() - start))) and future.cancel():
+                results.append((busy_message(call, time.perf_counter() - start), 0.0, False))
+                continue
+            pending.started.wait()
+
+            #The tool's own timeout counts from when it got its worker, the turn budget from the start of the step
+            now = time.perf_counter()
+            remaining = timeout - (now - pending.started_at)
+            if left is not None:
+                remaining = min(remaining, left - (now - start))
+            try:
+                results.append((*future.result(timeout=max(0.0, remaining)), False))
+            except FutureTimeoutError:
+                #The call is running, it is abandoned and keeps its worker until the request gives up
+                results.append((timeout_message(call, limit), time.perf_counter() - pending.started_at, True))
+
+        return _with_latency(results, time.perf_counter() - start)
+
+    async def arun_tools(state, config: RunnableConfig) -> dict:
+        async def run_one(call: dict):
+            invalid = invalid_tool(call)
+            if invalid is not None:
+                return invalid, 0.0, False
+            timeout = timeout_for(call, state, config)
+            call_start = time.perf_counter()
+            try:
+                #wait_for cancels the task on timeout, a sync tool running in the default executor is abandoned instead
+                message = await asyncio.wait_for(ainvoke_tool(call, config), timeout)
+            except asyncio.TimeoutError:
+                return timeout_message(call, timeout), timeout, True
+            return message, time.perf_counter() - call_start, False
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run_one(call) for call in tool_calls(state)))
+        return _with_latency(results, time.perf_counter() - start)
+
+    return RunnableLambda(run_tools, afunc=arun_tools, name=name)
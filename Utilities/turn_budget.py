@@ -0,0 +1,82 @@
+import os
+import time
+from dataclasses import dataclass, field
+from langchain_core.messages import SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+"""
+Per-turn latency budget for the LLM <-> tools loop of the tools chatbot.
+
+Nothing bounded how often the model could ask for tools within one user turn. The llm node now records when the turn
+started and how many tool rounds it has gone through in the graph state, and once either the time budget or the
+maximum number of tool rounds is used up it calls the plain model (no tools bound) with `FINAL_ANSWER_PROMPT` in the
+leading system message, so the turn ends with an answer built from what the tools already returned. `time_left` caps the tool timeouts by whatever is
+left of the budget.
+
+Defaults come from TURN_BUDGET_SECONDS (60) / MAX_TOOL_ROUNDS (4), read on every turn so a .env loaded after the
+import applies, and can be overridden per run with the configurable keys `turn_budget_seconds` / `max_tool_rounds`.
+The `turn_budget` report in the state describes the last turn.
+"""
+
+
+def _default_seconds() -> float:
+    return float(os.getenv("TURN_BUDGET_SECONDS", "60"))
+
+
+def _default_tool_rounds() -> int:
+    return int(os.getenv("MAX_TOOL_ROUNDS", "4"))
+
+
+FINAL_ANSWER_PROMPT = (
+    "No more tools are available for this question. Answer the user now using only the information gathered so far "
+    "and say briefly if something could not be looked up."
+)
+
+
+@dataclass
+class TurnBudget:
+    seconds: float = field(default_factory=_default_seconds)
+    max_tool_rounds: int = field(default_factory=_default_tool_rounds)
+
+    @classmethod
+    def from_config(cls, config: RunnableConfig | None) -> "TurnBudget":
+        configurable = (config or {}).get('configurable', {})
+        seconds, max_tool_rounds = configurable.get('turn_budget_seconds'), configurable.get('max_tool_rounds')
+        return cls(
+            seconds=float(seconds) if seconds is not None else _default_seconds(),
+            max_tool_rounds=int(max_tool_rounds) if max_tool_rounds is not None else _default_tool_rounds(),
+        )
+
+    def exhausted(self, turn: dict) -> bool:
+        return turn['tool_rounds'] >= self.max_tool_rounds or time.time() - turn['turn_started_at'] >= self.seconds
+
+    def report(self, turn: dict, forced_final_answer: bool) -> dict:
+        return {
+            'budget_seconds': self.seconds,
+            'elapsed_seconds': round(time.time() - turn['turn_started_at'], 3),
+            'tool_rounds': turn['tool_rounds'],
+            'max_tool_rounds': self.max_tool_rounds,
+            'forced_final_answer': forced_final_answer,
+        }
+
+
+def track_turn(state) -> dict:
+    """State update for the llm node: a new user turn restarts the clock, a round of tool results is counted."""
+    if state['messages'] and isinstance(state['messages'][-1], ToolMessage) and state.get('turn_started_at'):
+        return {'turn_started_at': state['turn_started_at'], 'tool_rounds': state.get('tool_rounds', 0) + 1}
+    return {'turn_started_at': time.time(), 'tool_rounds': 0}
+
+
+def final_answer_messages(messages: list) -> list:
+    #Several HF chat templates reject a system message anywhere but first, the instruction joins the leading one
+    if messages and isinstance(messages[0], SystemMessage):
+        return [SystemMessage(content=f"{messages[0].text}\n\n{FINAL_ANSWER_PROMPT}"), *messages[1:]]
+    return [SystemMessage(content=FINAL_ANSWER_PROMPT), *messages]
+
+
+def time_left(state, config: RunnableConfig | None) -> float | None:
+    """Seconds left of the current turn's budget, None outside of a tracked turn."""
+    started_at = state.get('turn_started_at')
+    if not started_at:
+        return None
+    return TurnBudget.from_config(config).seconds - (time.time() - started_at)